@@ -0,0 +1,210 @@
+"""
+Restaurant Management System - Benchmark
+Generates synthetic data files and drives each role operation of hotel.py
+headlessly, reporting latency percentiles, peak memory and I/O per operation.
+
+Usage:
+    python benchmark.py                       # 1k, 100k and 10M rows
+    python benchmark.py --rows 1000 100000 --repeat 50 --json results.json
+"""
+
+import argparse
+import builtins
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory is not reported
+    resource = None
+
+import hotel
+
+# ========== CONSTANTS ==========
+ROW_COUNTS = [1_000, 100_000, 10_000_000]
+REPEAT = 20
+MENU_SIZE = 50
+CHEF = "chef1"
+STATUSES_BY_WEIGHT = ["Completed"] * 8 + ["Pending", "In Progress"]
+
+# ========== DATA GENERATION ==========
+def write_lines(filename, lines):
+    """Write generated records without holding them all in memory"""
+    with open(filename, "w") as f:
+        for fields in lines:
+            f.write(','.join(fields) + '\n')
+
+def generate_data(rows, seed=42):
+    """Create the five data files in the current directory with rows records each"""
+    rng = random.Random(seed)
+    first_day = date(2020, 1, 1)
+    customers = max(rows // 10, 1)
+
+    write_lines(hotel.MENU_FILE, ([f"{i:02d}", f"Dish {i}", f"{rng.randint(50, 900)}.0"]
+                                  for i in range(1, MENU_SIZE + 1)))
+
+    staff = [["admin", "admin123", "Admin"], ["manager1", "manager123", "Manager"], [CHEF, "chef123", "Chef"]]
+    write_lines(hotel.USER_FILE, staff + [[f"customer{i}", f"pass{i}", "Customer"] for i in range(rows)])
+
+    def orders():
+        for order_id in range(1, rows + 1):
+            items = {f"{rng.randint(1, MENU_SIZE):02d}": rng.randint(1, 4) for _ in range(rng.randint(1, 4))}
+            total = sum(quantity * 100 for quantity in items.values())
+            yield [str(order_id), f"customer{rng.randrange(customers)}",
+                   ';'.join(f"{item_id}:{quantity}" for item_id, quantity in items.items()),
+                   f"{total:.2f}", rng.choice(STATUSES_BY_WEIGHT).ljust(hotel.STATUS_WIDTH),
+                   (first_day + timedelta(days=order_id * 1500 // rows)).isoformat(), ""]
+    write_lines(hotel.ORDERS_FILE, orders())
+
+    write_lines(hotel.FEEDBACK_FILE, ([str(i), f"customer{rng.randrange(customers)}", "N/A",
+                                       str(rng.randint(1, 5)), "synthetic feedback",
+                                       (first_day + timedelta(days=i * 1500 // rows)).isoformat()]
+                                      for i in range(1, rows + 1)))
+
+    write_lines(hotel.INGREDIENTS_FILE, ([str(i), f"ingredient{i}", str(rng.randint(1, 20)),
+                                          rng.choice(["Requested", "Approved"]), CHEF,
+                                          (first_day + timedelta(days=i * 1500 // rows)).isoformat()]
+                                         for i in range(1, rows + 1)))
+
+def reset_state():
+    """Forget everything hotel.py cached about the previous data directory"""
+    hotel.sync_data()
+    hotel._table_cache.clear()
+    hotel._order_index["offsets"] = None
+    hotel._order_index["end"] = 0
+    hotel._customer_index["orders"] = None
+    hotel._customer_index["end"] = 0
+    hotel._date_indexes.clear()
+    hotel._sales_sketch.update(signature=None, sketch=None, unsaved=0)
+
+# ========== MEASUREMENT ==========
+def io_counters():
+    """Bytes read and written by this process so far, console output included (Linux only)"""
+    try:
+        with open("/proc/self/io", "r") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_scripted(operation, answers):
+    """Call an interactive operation, answering its input() prompts from a list"""
+    replies = iter(answers)
+    real_input = builtins.input
+    builtins.input = lambda prompt="": next(replies)
+    try:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            return operation()
+    finally:
+        builtins.input = real_input
+
+def measure(name, operation, script, repeat):
+    """Time an operation repeat times; script(i) returns the input answers for run i"""
+    timings = []
+    read_before, written_before = io_counters()
+    for i in range(repeat):
+        answers = script(i)
+        start = time.perf_counter()
+        run_scripted(operation, answers)
+        timings.append(time.perf_counter() - start)
+    read_after, written_after = io_counters()
+
+    timings.sort()
+    cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+    return {
+        "operation": name,
+        "calls": repeat,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "max_ms": timings[-1] * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+        "read_bytes_per_call": (read_after - read_before) // repeat,
+        "written_bytes_per_call": (written_after - written_before) // repeat,
+    }
+
+# ========== SCENARIOS ==========
+def benchmark_dataset(rows, repeat):
+    """Run every role operation against a freshly generated dataset"""
+    rng = random.Random(rows)
+    customer = "customer0"
+    added_requests = []
+
+    def add_request():
+        hotel.add_ingredient_request(CHEF)
+        added_requests.append(str(int(open(hotel._sequence_file(hotel.INGREDIENTS_FILE)).read())))
+
+    scenarios = [
+        ("login", hotel.login, lambda i: ["1", customer, "pass0"]),
+        ("place_order", lambda: hotel.place_order(customer),
+         lambda i: [f"{rng.randint(1, MENU_SIZE):02d}", "2", "done"]),
+        ("view_order_status", lambda: hotel.view_order_status(customer), lambda i: []),
+        ("view_orders", hotel.view_orders, lambda i: []),
+        ("update_order_status", hotel.update_order_status,
+         lambda i: [str(rng.randint(1, rows)), rng.choice(hotel.ORDER_STATUSES)]),
+        ("view_sales_report", hotel.view_sales_report, lambda i: []),
+        ("add_ingredient_request", add_request, lambda i: [f"benchmark{i}", "3"]),
+        ("edit_ingredient_request", lambda: hotel.edit_ingredient_request(CHEF),
+         lambda i: [added_requests[i % len(added_requests)], "", "7"]),
+        ("delete_ingredient_request", lambda: hotel.delete_ingredient_request(CHEF),
+         lambda i: [added_requests.pop()]),
+        ("view_ingredient_requests", hotel.view_ingredient_requests, lambda i: []),
+    ]
+    return [measure(name, operation, script, repeat) for name, operation, script in scenarios]
+
+def print_results(rows, results):
+    """Print one dataset's results as a table"""
+    print(f"\n=== {rows:,} rows ===")
+    print(f"{'operation':<26}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>10}{'read B':>14}{'written B':>12}")
+    for result in results:
+        print(f"{result['operation']:<26}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+              f"{result['p99_ms']:>10.2f}{result['peak_rss_mb']:>10.1f}"
+              f"{result['read_bytes_per_call']:>14,}{result['written_bytes_per_call']:>12,}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hotel.py operations on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=ROW_COUNTS, help="dataset sizes to run")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="calls per operation")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the generated data directories")
+    args = parser.parse_args()
+
+    home = os.getcwd()
+    report = {}
+    for rows in args.rows:
+        workdir = tempfile.mkdtemp(prefix=f"hotel-bench-{rows}-")
+        try:
+            os.chdir(workdir)
+            reset_state()
+            start = time.perf_counter()
+            generate_data(rows)
+            print(f"\nGenerated {rows:,} rows in {workdir} ({time.perf_counter() - start:.1f}s)")
+            report[rows] = benchmark_dataset(rows, args.repeat)
+            print_results(rows, report[rows])
+            reset_state()
+        finally:
+            os.chdir(home)
+            if not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
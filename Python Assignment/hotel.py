@@ -4,8 +4,36 @@ CT108-3-1 Group Assignment
 APU, 2024
 """
 
+import argparse
+import atexit
+import base64
+import bisect
+import cProfile
+import csv
+import functools
+import gzip
+import hashlib
+import heapq
+import hmac
+import json
+import math
+import mmap
 import os
-from datetime import datetime
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows has no advisory locks; run a single terminal per data directory there
+    fcntl = None
 
 # ========== CONSTANTS ==========
 USER_FILE = "users.txt"
@@ -13,38 +41,2753 @@ MENU_FILE = "menu.txt"
 ORDERS_FILE = "orders.txt"
 FEEDBACK_FILE = "feedback.txt"
 INGREDIENTS_FILE = "ingredients.txt"
+ORDER_INDEX_FILE = "orders.idx"  # order_id -> byte offset of the record in ORDERS_FILE
+CUSTOMER_INDEX_FILE = "customers.idx"  # username -> byte offsets of that customer's orders
+DATE_INDEX_FILES = {ORDERS_FILE: "orders.dates.idx", FEEDBACK_FILE: "feedback.dates.idx"}  # date -> byte offsets
+SALES_SUMMARY_FILE = "sales_summary.json"  # Running sales aggregates over ORDERS_FILE
+SALES_SKETCH_FILE = "sales_sketch.json"  # Streaming item and customer analytics over every order placed
+KITCHEN_QUEUE_FILE = "kitchen_queue.json"  # Offsets of the Pending and In Progress orders
+LOCK_FILE = "hotel.lock"  # Reader/writer lock shared by every terminal using these files
+JOURNAL_FILE = "hotel.journal"  # Write-ahead journal for full-table rewrites
+DATABASE_FILE = "hotel.db"
+MENU_VERSIONS_FILE = "menu_versions.jsonl"  # One snapshot line per menu catalog version
+ARCHIVE_DIR = "archive"  # Sealed monthly order segments
+ORDER_MANIFEST_FILE = "orders_manifest.json"  # Date range, status counts and totals of each sealed segment
+ARCHIVE_INDEX_FILE = os.path.join(ARCHIVE_DIR, "orders.idx")  # Archived order_id -> customer and month
+STORAGE_ENGINE = os.environ.get("HOTEL_STORAGE", "text")  # "text" or "sqlite"
 MAX_LOGIN_ATTEMPTS = 3
 ROLES = ["Admin", "Manager", "Chef", "Customer"]
+ORDER_STATUSES = ["Pending", "In Progress", "Completed"]
+ACTIVE_STATUSES = {"Pending", "In Progress"}
+STATUS_WIDTH = max(len(status) for status in ORDER_STATUSES)  # Status fields are padded so they can be patched in place
+TABLE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Cap on cached table data, measured by file size
+FSYNC_BATCH_SIZE = 0  # fsync appended records every N appends (0 = leave it to the OS)
+PASSWORD_HASH_ITERATIONS = 100_000  # PBKDF2 rounds for newly stored passwords
+REHASH_FLUSH_USERS = 50  # Plain-text logins upgraded in memory before their hashes are written back
+REPORT_PERIODS = ["day", "week", "month"]  # Groupings offered by the date range report
+REPORT_WORKERS = os.cpu_count() or 1  # Processes used to aggregate large sales reports
+PARALLEL_REPORT_MIN_BYTES = 16 * 1024 * 1024  # Below this much order data, reports stay in one process
+SKETCH_WIDTH = 8192  # Counters per Count-Min row; overcounts by at most ~e/width of everything counted
+SKETCH_DEPTH = 4  # Count-Min rows; each one makes a large overcount less likely
+DAILY_SKETCH_WIDTH = 128  # Counters per row of each day's item sketch, which sees only that day's orders
+SKETCH_SAVE_ORDERS = 1000  # Orders folded into the in-memory sketch before it is saved again
+SKETCH_TOP_K = 100  # Heavy hitters tracked per sketch, so the most an analytics report can rank
+HLL_PRECISION = 10  # 2**10 HyperLogLog registers per day, about 3% error on distinct customers
+STATS_FILE = os.environ.get("HOTEL_STATS")  # Per-operation stats dump (.prom for Prometheus text, else JSON)
+PROFILE_FILE = os.environ.get("HOTEL_PROFILE")  # cProfile output for the whole session
+INGEST_BATCH_SIZE = 1000  # Orders priced, numbered and appended together by --ingest
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8080
+SERVER_THREADS = 32  # Worker threads of the --serve pool
+SERVER_IDLE_TIMEOUT = 5  # Seconds a kept-alive connection may sit idle before its worker is freed
+
+# ========== INSTRUMENTATION ==========
+# Only active when HOTEL_STATS is set; otherwise instrumented() hands back the
+# undecorated function and count_io() returns straight away.
+_stats = {} if STATS_FILE else None  # operation -> calls, seconds, rows parsed, bytes written
+_active_operations = []  # Instrumented calls currently running, outermost first
+
+def instrumented(func):
+    """Record call count and wall time for func, plus the I/O done inside it"""
+    if _stats is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        entry = _stats.setdefault(func.__name__, {"calls": 0, "seconds": 0.0, "rows_parsed": 0, "bytes_written": 0})
+        _active_operations.append(entry)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            entry["seconds"] += time.perf_counter() - start
+            entry["calls"] += 1
+            _active_operations.pop()
+    return wrapper
+
+def count_io(rows_parsed=0, bytes_written=0):
+    """Charge parsed rows and written bytes to every operation in progress"""
+    if _stats is None:
+        return
+    for entry in _active_operations:
+        entry["rows_parsed"] += rows_parsed
+        entry["bytes_written"] += bytes_written
+
+def dump_stats():
+    """Write the collected stats to STATS_FILE"""
+    if _stats is None:
+        return
+    with open(STATS_FILE, "w") as f:
+        if not STATS_FILE.endswith(".prom"):
+            json.dump(_stats, f, indent=2)
+            return
+        for metric, field, kind in [("hotel_operation_calls_total", "calls", "counter"),
+                                    ("hotel_operation_seconds_total", "seconds", "counter"),
+                                    ("hotel_rows_parsed_total", "rows_parsed", "counter"),
+                                    ("hotel_bytes_written_total", "bytes_written", "counter")]:
+            f.write(f"# TYPE {metric} {kind}\n")
+            for operation, entry in sorted(_stats.items()):
+                f.write(f'{metric}{{operation="{operation}"}} {entry[field]}\n')
+
+atexit.register(dump_stats)
+
+# ========== LOCKING ==========
+_lock = {"fd": None, "depth": 0, "exclusive": False, "thread": threading.RLock()}
+
+@contextmanager
+def data_lock(exclusive=False):
+    """Hold the data lock for the block: shared for readers, exclusive for writers
+
+    Nested use is cheap; asking for exclusive inside a shared block upgrades
+    the lock until the outermost block ends. Also usable as a decorator.
+    Threads of one process take turns, since they share its caches.
+    """
+    with _lock["thread"]:
+        if fcntl is None:
+            yield
+            return
+        with _file_lock(exclusive):
+            yield
+
+@contextmanager
+def _file_lock(exclusive):
+    """The cross-process half of data_lock()"""
+    if _lock["fd"] is None:
+        _lock["fd"] = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+    if not _lock["depth"] or (exclusive and not _lock["exclusive"]):
+        fcntl.flock(_lock["fd"], fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        _lock["exclusive"] = _lock["exclusive"] or exclusive
+    _lock["depth"] += 1
+    try:
+        if exclusive and os.path.exists(JOURNAL_FILE):
+            _replay_journal()  # Left by a writer that died mid-commit; finish it before writing anything
+        yield
+    finally:
+        _lock["depth"] -= 1
+        if not _lock["depth"]:
+            fcntl.flock(_lock["fd"], fcntl.LOCK_UN)
+            _lock["exclusive"] = False
 
 # ========== FILE HANDLING ==========
-def read_data(filename):
-    """Generic function to read data from files"""
+_table_cache = OrderedDict()  # filename -> [signature, rows, records], least recently used first
+
+def _file_signature(filename):
+    """Identify a file version by inode, size and modification time"""
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+@data_lock()
+def _parse_file(filename):
+    """Parse every non-blank line of a file into a list of fields"""
     data = []
     try:
         with open(filename, "r") as f:
             for line in f:
                 if line.strip():
-                    data.append(line.strip().split(','))
+                    data.append([field.strip() for field in line.split(',')])
     except FileNotFoundError:
         pass
+    count_io(rows_parsed=len(data))
     return data
 
+def _cache_table(filename, signature, rows, records=None):
+    """Store parsed rows, evicting least recently used tables over the memory cap"""
+    _table_cache.pop(filename, None)
+    if signature is None or signature[1] > TABLE_CACHE_MAX_BYTES:
+        return
+    _table_cache[filename] = [signature, rows, records]
+    while sum(entry[0][1] for entry in _table_cache.values()) > TABLE_CACHE_MAX_BYTES:
+        _table_cache.popitem(last=False)
+
+def _load_table(filename):
+    """Return the cached rows of a file, re-parsing only when the file has changed"""
+    if filename in _batch["pending"]:
+        return _batch["pending"][filename]  # Rewritten earlier in the current batch
+    signature = _file_signature(filename)  # Taken before reading so a racing write just forces a re-parse
+    entry = _table_cache.get(filename)
+    if entry and entry[0] == signature:
+        _table_cache.move_to_end(filename)
+        return entry[1]
+    rows = _parse_file(filename)
+    _cache_table(filename, signature, rows)
+    return rows
+
+@instrumented
+def read_data(filename):
+    """Generic function to read data from files"""
+    return STORAGE.read(filename)
+
+def iter_records(filename, columns=None, where=None):
+    """Stream records one at a time instead of loading the whole file
+
+    columns -- field positions to yield, in order (every field if None)
+    where -- {field position: allowed values}; other rows are skipped before
+             they are fully split
+    """
+    return STORAGE.iter(filename, columns, where)
+
+def _stream_file(filename, where):
+    """Yield parsed lines, dropping rows that fail the where filter on a partial split"""
+    last = max(where) if where else None
+    try:
+        with open(filename, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if where:
+                    head = line.split(',', last + 1)  # Split only as far as the filtered fields
+                    if len(head) <= last or any(head[col].strip() not in allowed for col, allowed in where.items()):
+                        continue
+                count_io(rows_parsed=1)
+                yield [field.strip() for field in line.split(',')]
+    except FileNotFoundError:
+        return
+
+@instrumented
 def write_data(filename, data):
     """Generic function to write data to files"""
-    with open(filename, "w") as f:
-        for item in data:
-            f.write(','.join(item) + '\n')
+    STORAGE.write(filename, data)
+
+_unsynced_appends = {}  # filename -> appends written since the last fsync
+
+@instrumented
+def append_data(filename, row):
+    """Append a single record to a file without rewriting it"""
+    STORAGE.append(filename, row)
+
+@instrumented
+def append_rows(filename, rows):
+    """Append many records to a file in one write"""
+    STORAGE.append_rows(filename, rows)
+
+def _refresh_cached_table(filename, before, expected_size, change):
+    """Apply our own write to the cached rows if nobody else touched the file meanwhile"""
+    entry = _table_cache.get(filename)
+    after = _file_signature(filename)
+    if not entry or entry[0] != before or after is None or after[1] != expected_size:
+        _table_cache.pop(filename, None)
+        return
+    change(entry[1], entry[2])
+    _cache_table(filename, after, entry[1], entry[2])
+
+def _append_cached_rows(filename, rows, records, new_rows):
+    """Mirror appended records in the cached rows and decoded records"""
+    new_rows = [[field.strip() for field in row] for row in new_rows]
+    rows.extend(new_rows)
+    if records is not None:
+        records.extend(_decode_records(filename, new_rows))
+
+def sync_data():
+    """Flush appends still waiting for a group commit"""
+    for filename, pending in _unsynced_appends.items():
+        if pending:
+            fd = os.open(filename, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    _unsynced_appends.clear()
+
+atexit.register(sync_data)
+
+# ========== WRITE-AHEAD JOURNAL ==========
+# Full-table rewrites are first appended to JOURNAL_FILE and fsynced, then
+# swapped into place with os.replace, so readers only ever see a complete
+# file. The swapped files are fsynced and the journal removed before the
+# exclusive lock is released, so a journal on disk always belongs to a writer
+# that died mid-commit, and nobody has written since: the next writer to take
+# the lock replays it before doing anything else.
+_batch = {"depth": 0, "pending": OrderedDict()}  # filename -> rows rewritten in the open batch
+
+@contextmanager
+def batch_writes():
+    """Group every write inside the block into a single durable commit"""
+    with data_lock(exclusive=True):  # Other terminals wait until the batch commits
+        _batch["depth"] += 1
+        try:
+            yield
+        except BaseException:
+            _batch["depth"] -= 1
+            if not _batch["depth"]:
+                STORAGE.rollback()
+            raise
+        _batch["depth"] -= 1
+        if not _batch["depth"]:
+            STORAGE.commit()
+
+def _fsync_path(path):
+    """fsync a file or directory by name, where the platform allows it"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Directories cannot be opened on Windows
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _replace_file(filename, rows):
+    """Write a whole table to a temp file and swap it in atomically"""
+    _table_cache.pop(filename, None)
+    if filename == ORDERS_FILE:
+        _reset_order_index()  # Every offset moves on a full rewrite
+        _reset_customer_index()
+        _reset_sales_summary()
+        _reset_sales_sketch()
+        _reset_kitchen_queue()
+    if filename == USER_FILE:
+        _user_directory.update(signature=None, end=0, users={})  # The new file may reuse the old inode
+    if filename in DATE_INDEX_FILES:
+        _reset_date_index(filename)
+    temp_file = filename + ".tmp"
+    with open(temp_file, "w") as f:
+        for item in rows:
+            f.write(','.join(_pad_order_row(filename, item)) + '\n')
+        count_io(bytes_written=f.tell())
+    os.replace(temp_file, filename)
+
+@data_lock(exclusive=True)
+def _commit_journal(pending):
+    """Make a batch of table rewrites durable with one fsync, then apply them"""
+    with open(JOURNAL_FILE, "a") as f:
+        start = f.tell()
+        for filename, rows in pending.items():
+            f.write(json.dumps({"file": filename, "rows": rows}) + '\n')
+        f.write(json.dumps({"commit": list(pending)}) + '\n')
+        count_io(bytes_written=f.tell() - start)
+        f.flush()
+        os.fsync(f.fileno())
+    for filename, rows in pending.items():
+        _replace_file(filename, rows)
+    _truncate_journal(pending)  # Before the lock is released, so no later write can be replayed over
+
+def _truncate_journal(filenames):
+    """fsync the journalled tables, then drop the journal"""
+    for filename in filenames:
+        _fsync_path(filename)
+    _fsync_path(os.path.dirname(os.path.abspath(JOURNAL_FILE)))  # Persist the renames too
+    if os.path.exists(JOURNAL_FILE):
+        os.remove(JOURNAL_FILE)
+
+@data_lock(exclusive=True)
+def recover_journal():
+    """Re-apply journalled rewrites left behind by a crash
+
+    Taking the exclusive lock already does this; on platforms without file
+    locks it runs once at startup.
+    """
+    if os.path.exists(JOURNAL_FILE):
+        _replay_journal()
+
+def _replay_journal():
+    """Apply the last committed batch in the journal, dropping any torn tail"""
+    committed, entries = OrderedDict(), OrderedDict()
+    with open(JOURNAL_FILE, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # Torn write at the tail, the batch never committed
+            if "commit" in entry:
+                committed.update(entries)
+                entries.clear()
+            else:
+                entries[entry["file"]] = entry["rows"]
+    for filename, rows in committed.items():
+        _replace_file(filename, rows)
+    _truncate_journal(committed)
+
+# ========== ID ALLOCATION ==========
+def _sequence_file(filename):
+    """Counter file holding the last ID handed out for a table"""
+    return os.path.splitext(filename)[0] + ".seq"
+
+@data_lock(exclusive=True)
+def allocate_ids(filename, count=1):
+    """Reserve count consecutive IDs for a table and return them as strings"""
+    seq_file = _sequence_file(filename)
+    try:
+        with open(seq_file, "r") as f:
+            last = int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        # First use: continue from the highest ID already in the table
+        ids = (row[0] for row in iter_records(filename, columns=[0]))
+        last = max((int(record_id) for record_id in ids if record_id.isdigit()), default=0)
+        if filename == ORDERS_FILE:
+            last = max([last] + [segment["last_id"] for segment in order_manifest()["segments"].values()])
+
+    # Persist the new high-water mark before handing the IDs out, so a crash can only skip IDs
+    temp_file = seq_file + ".tmp"
+    with open(temp_file, "w") as f:
+        f.write(f"{last + count}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, seq_file)
+    return [str(record_id) for record_id in range(last + 1, last + count + 1)]
+
+# ========== ORDER INDEX ==========
+_order_index = {"offsets": None, "end": 0}  # Loaded offsets and the ORDERS_FILE size they cover
+
+def _reset_order_index():
+    """Forget the order index so it is rebuilt from ORDERS_FILE on next use"""
+    _order_index["offsets"] = None
+    _order_index["end"] = 0
+    if os.path.exists(ORDER_INDEX_FILE):
+        os.remove(ORDER_INDEX_FILE)
+
+def _scan_order_offsets(start):
+    """Yield (order_id, offset) for every record in ORDERS_FILE from byte offset start"""
+    with open(ORDERS_FILE, "rb") as f:
+        f.seek(start)
+        offset = start
+        for line in f:
+            if line.strip():
+                yield line.split(b',', 1)[0].strip().decode(), offset
+            offset += len(line)
+
+def _load_order_index():
+    """Load the saved index and note how much of ORDERS_FILE it covers"""
+    offsets = {}
+    end = 0
+    try:
+        with open(ORDER_INDEX_FILE, "r") as f:
+            for line in f:
+                if line.strip():
+                    order_id, offset = line.strip().split(',')
+                    offsets[order_id] = int(offset)
+                    end = max(end, int(offset))
+        if offsets:
+            with open(ORDERS_FILE, "rb") as f:
+                f.seek(end)
+                end += len(f.readline())  # The index covers up to the end of its last record
+    except (FileNotFoundError, ValueError):
+        offsets, end = {}, 0
+    _order_index["offsets"] = offsets
+    _order_index["end"] = end
+
+@data_lock()
+def order_offsets():
+    """Return the order_id -> byte offset index, indexing any orders appended since last use"""
+    size = os.path.getsize(ORDERS_FILE) if os.path.exists(ORDERS_FILE) else 0
+    if _order_index["offsets"] is None or size != _order_index["end"]:
+        _catch_up_order_index()
+    return _order_index["offsets"]
+
+@data_lock(exclusive=True)
+def _catch_up_order_index():
+    """Load the order index if needed and append the orders added since; only this half writes"""
+    if _order_index["offsets"] is None:
+        _load_order_index()
+    size = os.path.getsize(ORDERS_FILE) if os.path.exists(ORDERS_FILE) else 0
+    if size < _order_index["end"]:
+        _reset_order_index()  # File shrank, so it was rewritten behind our back
+        _order_index["offsets"] = {}
+    if size > _order_index["end"]:
+        new_entries = list(_scan_order_offsets(_order_index["end"]))
+        with open(ORDER_INDEX_FILE, "a") as f:
+            for order_id, offset in new_entries:
+                _order_index["offsets"][order_id] = offset
+                f.write(f"{order_id},{offset}\n")
+        _order_index["end"] = size
+
+def _read_order_at(f, order_id, offset):
+    """Return the raw record at offset if it belongs to order_id, else None"""
+    f.seek(offset)
+    line = f.readline()
+    if line.split(b',', 1)[0].strip().decode() != order_id:
+        return None
+    return line
+
+@data_lock()
+def order_record(order_id):
+    """Return [the order with this ID], read at its indexed offset, or [] if ORDERS_FILE has none"""
+    if not os.path.exists(ORDERS_FILE):
+        return []
+    for attempt in range(2):
+        offset = order_offsets().get(order_id)
+        if offset is None:
+            return []
+        with open(ORDERS_FILE, "rb") as f:
+            line = _read_order_at(f, order_id, offset)
+        if line is not None:
+            count_io(rows_parsed=1)
+            return _decode_records(ORDERS_FILE, [[field.strip() for field in line.decode().split(',')]])
+        with data_lock(exclusive=True):
+            _reset_order_index()  # Stale offset: rebuild once in case the file was edited by hand
+    return []
+
+@data_lock(exclusive=True)
+def _patch_order_statuses(changes):
+    """Patch many orders' statuses in place with a single fsync
+
+    changes -- {order_id: new_status}. Returns the IDs of the orders found.
+    """
+    found, rewrite = set(), {}
+    if ORDERS_FILE in _batch["pending"]:
+        rewrite = dict(changes)  # Already being rewritten in this batch
+    elif os.path.exists(ORDERS_FILE):
+        missed = _apply_status_patches(changes, found, rewrite)
+        if missed:
+            _reset_order_index()  # Stale offset: rebuild once in case the file was edited by hand
+            _apply_status_patches(missed, found, rewrite)
+    if not rewrite:
+        return found
+
+    # Fall back to a full rewrite, which pads every status so later updates can be patched
+    text = TextStorage()
+    orders = text.read(ORDERS_FILE)
+    for order in orders:
+        if order[0] in rewrite:
+            order[4] = rewrite[order[0]]
+            found.add(order[0])
+    if found & set(rewrite):
+        text.write(ORDERS_FILE, orders)
+    return found
+
+def _apply_status_patches(changes, found, rewrite):
+    """One pass of _patch_order_statuses(); returns the changes whose indexed offset held another record
+
+    IDs missing from the index are left out of found without a rebuild; the caller reports them.
+    """
+    offsets = order_offsets()
+    queue = summary = None
+    queue_changed = False
+    missed, patched = {}, {}
+    before = _file_signature(ORDERS_FILE)
+    with open(ORDERS_FILE, "r+b") as f:
+        for order_id, new_status in changes.items():
+            offset = offsets.get(order_id)
+            if offset is None:
+                continue  # Unknown or archived order
+            line = _read_order_at(f, order_id, offset)
+            if line is None:
+                missed[order_id] = new_status
+                continue
+            fields = line.split(b',')
+            width = len(fields[4])
+            if len(new_status) > width:
+                rewrite[order_id] = new_status  # Legacy unpadded field, needs a rewrite
+                continue
+            if queue is None:
+                queue = _load_kitchen_queue()  # Catch up before the first patch so it is not folded in twice
+            order = Order.from_row([field.strip() for field in line.decode().split(',')])
+            if summary is None and "Completed" in (order.status, new_status):
+                summary = _load_sales_summary()
+            f.seek(offset + sum(len(field) + 1 for field in fields[:4]))
+            f.write(new_status.ljust(width).encode())
+            count_io(bytes_written=width)
+            if summary is not None:
+                _record_status_change(summary, order, new_status)
+            if (order.status in ACTIVE_STATUSES) != (new_status in ACTIVE_STATUSES):
+                _record_queue_change(queue, order_id, offset, new_status)
+                queue_changed = True
+            patched[order_id] = new_status
+            found.add(order_id)
+        if patched:
+            f.flush()
+            os.fsync(f.fileno())  # One durable write for the whole batch
+    if patched:
+        if summary is not None:
+            _save_sales_summary(summary)
+        if queue_changed:
+            _save_kitchen_queue(queue)
+        _refresh_cached_table(ORDERS_FILE, before, before[1],
+                              lambda rows, records: _set_cached_statuses(rows, records, patched))
+    return missed
+
+def _set_cached_statuses(rows, records, patched):
+    """Mirror in-place status patches ({order_id: new_status}) in the cached orders table"""
+    for row in rows:
+        if row[0] in patched:
+            row[4] = patched[row[0]]
+    for order in records or []:
+        if order.order_id in patched:
+            order.status = patched[order.order_id]
+
+# ========== CUSTOMER INDEX ==========
+# username -> the offsets of that customer's orders in ORDERS_FILE, kept in
+# CUSTOMER_INDEX_FILE as appended "username,order_id,offset" lines.
+_customer_index = {"orders": None, "end": 0}  # Loaded entries and the ORDERS_FILE size they cover
+
+def _reset_customer_index():
+    """Forget the customer index so it is rebuilt from ORDERS_FILE on next use"""
+    _customer_index["orders"] = None
+    _customer_index["end"] = 0
+    if os.path.exists(CUSTOMER_INDEX_FILE):
+        os.remove(CUSTOMER_INDEX_FILE)
+
+def _load_customer_index():
+    """Load the saved index and note how much of ORDERS_FILE it covers"""
+    orders = {}
+    end = 0
+    try:
+        with open(CUSTOMER_INDEX_FILE, "r") as f:
+            for line in f:
+                if line.strip():
+                    username, order_id, offset = line.strip().split(',')
+                    orders.setdefault(username, {})[order_id] = int(offset)
+                    end = max(end, int(offset))
+        if orders:
+            with open(ORDERS_FILE, "rb") as f:
+                f.seek(end)
+                end += len(f.readline())  # The index covers up to the end of its last record
+    except FileNotFoundError:
+        orders, end = {}, 0
+    except ValueError:
+        _reset_customer_index()  # Torn line, start over rather than append after it
+        orders, end = {}, 0
+    _customer_index["orders"] = orders
+    _customer_index["end"] = end
+
+@data_lock()
+def customer_index():
+    """Return username -> {order_id: offset}, indexing any orders appended since last use"""
+    size = os.path.getsize(ORDERS_FILE) if os.path.exists(ORDERS_FILE) else 0
+    if _customer_index["orders"] is None or size != _customer_index["end"]:
+        _catch_up_customer_index()
+    return _customer_index["orders"]
+
+@data_lock(exclusive=True)
+def _catch_up_customer_index():
+    """Load the customer index if needed and append the orders added since; only this half writes"""
+    if _customer_index["orders"] is None:
+        _load_customer_index()
+    size = os.path.getsize(ORDERS_FILE) if os.path.exists(ORDERS_FILE) else 0
+    if size < _customer_index["end"]:
+        _reset_customer_index()  # File shrank, so it was rewritten behind our back
+        _customer_index["orders"] = {}
+    if size > _customer_index["end"]:
+        offset = _customer_index["end"]
+        with open(ORDERS_FILE, "rb") as f, open(CUSTOMER_INDEX_FILE, "a") as index:
+            f.seek(offset)
+            for line in f:
+                fields = line.split(b',', 2)
+                if len(fields) > 2:
+                    order_id, username = fields[0].strip().decode(), fields[1].strip().decode()
+                    _customer_index["orders"].setdefault(username, {})[order_id] = offset
+                    index.write(f"{username},{order_id},{offset}\n")
+                offset += len(line)
+        _customer_index["end"] = size
+
+@data_lock()
+def customer_order_history(username):
+    """Return one customer's orders, oldest first, reading only their records"""
+    if not os.path.exists(ORDERS_FILE):
+        return []
+    for attempt in range(2):
+        entries = customer_index().get(username, {})
+        rows = []
+        with open(ORDERS_FILE, "rb") as f:
+            for order_id, offset in sorted(entries.items(), key=lambda entry: entry[1]):
+                line = _read_order_at(f, order_id, offset)
+                if line is None:
+                    break  # Stale offset
+                rows.append([field.strip() for field in line.decode().split(',')])
+            else:
+                count_io(rows_parsed=len(rows))
+                return _decode_records(ORDERS_FILE, rows)
+        with data_lock(exclusive=True):
+            _reset_customer_index()  # Rebuild once in case the file was edited by hand
+    return _decode_records(ORDERS_FILE, _stream_file(ORDERS_FILE, {1: {username}}))
+
+# ========== DATE INDEX ==========
+# Sorted (date, offset) pairs for each table in DATE_INDEX_FILES, saved as
+# appended "date,offset" lines, so a date range costs two bisects plus one
+# read per record in it instead of a scan of the whole file.
+DATE_COLUMN = 5  # Position of the date field in orders and feedback rows
+_date_indexes = {}  # filename -> {"entries": sorted [(date, offset)], "end": file size covered}
+
+def _reset_date_index(filename):
+    """Forget a table's date index so it is rebuilt on next use"""
+    _date_indexes.pop(filename, None)
+    if os.path.exists(DATE_INDEX_FILES[filename]):
+        os.remove(DATE_INDEX_FILES[filename])
+
+def _load_date_index(filename):
+    """Load the saved date index and note how much of the table it covers"""
+    entries = []
+    end = 0
+    try:
+        with open(DATE_INDEX_FILES[filename], "r") as f:
+            for line in f:
+                if line.strip():
+                    day, offset = line.strip().split(',')
+                    entries.append((day, int(offset)))
+                    end = max(end, int(offset))
+        if entries:
+            with open(filename, "rb") as f:
+                f.seek(end)
+                end += len(f.readline())  # The index covers up to the end of its last record
+    except FileNotFoundError:
+        entries, end = [], 0
+    except ValueError:
+        _reset_date_index(filename)  # Torn line, start over rather than append after it
+        entries, end = [], 0
+    entries.sort()
+    _date_indexes[filename] = {"entries": entries, "end": end}
+
+@data_lock()
+def date_index(filename):
+    """Return a table's sorted (date, offset) pairs, indexing any records appended since last use"""
+    size = os.path.getsize(filename) if os.path.exists(filename) else 0
+    if filename not in _date_indexes or size != _date_indexes[filename]["end"]:
+        _catch_up_date_index(filename)
+    return _date_indexes[filename]["entries"]
+
+@data_lock(exclusive=True)
+def _catch_up_date_index(filename):
+    """Load a table's date index if needed and append the records added since; only this half writes"""
+    if filename not in _date_indexes:
+        _load_date_index(filename)
+    index = _date_indexes[filename]
+    size = os.path.getsize(filename) if os.path.exists(filename) else 0
+    if size < index["end"]:
+        _reset_date_index(filename)  # File shrank, so it was rewritten behind our back
+        index = _date_indexes[filename] = {"entries": [], "end": 0}
+    if size > index["end"]:
+        entries = index["entries"]
+        offset = index["end"]
+        new = []
+        with open(filename, "rb") as f, open(DATE_INDEX_FILES[filename], "a") as saved:
+            f.seek(offset)
+            for line in f:
+                fields = line.split(b',', DATE_COLUMN + 1)
+                if len(fields) > DATE_COLUMN:
+                    new.append((fields[DATE_COLUMN].strip().decode(), offset))
+                    saved.write(f"{new[-1][0]},{offset}\n")
+                offset += len(line)
+        new.sort()
+        if entries and new and new[0] < entries[-1]:
+            index["entries"] = list(heapq.merge(entries, new))  # Back-dated records, e.g. from a bulk ingest
+        else:
+            entries.extend(new)  # Records are mostly appended in date order
+        index["end"] = size
+
+@data_lock()
+def records_in_range(filename, start=None, end=None):
+    """Return the raw rows of a table dated start..end (inclusive; None = unbounded), in file order"""
+    first = start.isoformat() if start else ""
+    after = (end + timedelta(days=1)).isoformat() if end else None
+    if not os.path.exists(filename):
+        return []
+    for attempt in range(2):
+        entries = date_index(filename)
+        low = bisect.bisect_left(entries, (first,))
+        high = bisect.bisect_left(entries, (after,)) if after else len(entries)
+        rows = []
+        with open(filename, "rb") as f:
+            for day, offset in sorted(entries[low:high], key=lambda entry: entry[1]):
+                f.seek(offset)
+                row = [field.strip() for field in f.readline().decode().split(',')]
+                if len(row) <= DATE_COLUMN or row[DATE_COLUMN] != day:
+                    break  # Stale offset
+                rows.append(row)
+            else:
+                count_io(rows_parsed=len(rows))
+                return rows
+        with data_lock(exclusive=True):
+            _reset_date_index(filename)  # Rebuild once in case the file was edited by hand
+    return [row for row in _stream_file(filename, None)
+            if len(row) > DATE_COLUMN and first <= row[DATE_COLUMN] and (after is None or row[DATE_COLUMN] < after)]
+
+# ========== SALES SUMMARY ==========
+def _empty_sales_summary():
+    """Aggregates for an empty order history"""
+    return {
+        "end": 0,  # Bytes of ORDERS_FILE folded into the totals
+        "completed_orders": 0,
+        "total_sales": 0.0,
+        "sales_by_date": {},  # date -> [completed orders, revenue]
+        "item_sales": {}  # item_id -> quantity sold
+    }
+
+def _add_sale(summary, order, sign):
+    """Add (sign=1) or remove (sign=-1) one completed order from the aggregates"""
+    summary["completed_orders"] += sign
+    summary["total_sales"] = round(summary["total_sales"] + sign * order.total, 2)
+
+    day_key = order.date.isoformat()
+    day = summary["sales_by_date"].setdefault(day_key, [0, 0.0])
+    day[0] += sign
+    day[1] = round(day[1] + sign * order.total, 2)
+    if day[0] <= 0:
+        del summary["sales_by_date"][day_key]
+
+    for item_id, quantity in order.items:
+        summary["item_sales"][item_id] = summary["item_sales"].get(item_id, 0) + sign * quantity
+        if summary["item_sales"][item_id] <= 0:
+            del summary["item_sales"][item_id]
+
+def _merge_sales(summary, other):
+    """Fold the completed-order aggregates of other into summary"""
+    summary["completed_orders"] += other["completed_orders"]
+    summary["total_sales"] = round(summary["total_sales"] + other["total_sales"], 2)
+    for day_key, (count, revenue) in other["sales_by_date"].items():
+        day = summary["sales_by_date"].setdefault(day_key, [0, 0.0])
+        day[0] += count
+        day[1] = round(day[1] + revenue, 2)
+    for item_id, quantity in other["item_sales"].items():
+        summary["item_sales"][item_id] = summary["item_sales"].get(item_id, 0) + quantity
+
+def _save_sales_summary(summary):
+    """Atomically replace the saved aggregates"""
+    temp_file = SALES_SUMMARY_FILE + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump(summary, f)
+    os.replace(temp_file, SALES_SUMMARY_FILE)
+
+def _reset_sales_summary():
+    """Drop the saved aggregates so they are rebuilt from ORDERS_FILE on next use"""
+    if os.path.exists(SALES_SUMMARY_FILE):
+        os.remove(SALES_SUMMARY_FILE)
+
+@data_lock()
+def _load_sales_summary():
+    """Return the saved sales aggregates, folding in any orders appended since they were saved"""
+    try:
+        with open(SALES_SUMMARY_FILE, "r") as f:
+            summary = json.load(f)
+    except (FileNotFoundError, ValueError):
+        summary = None
+    size = os.path.getsize(ORDERS_FILE) if os.path.exists(ORDERS_FILE) else 0
+    if summary is None or size != summary["end"]:
+        return _catch_up_sales_summary()
+    return summary
+
+@data_lock(exclusive=True)
+def _catch_up_sales_summary():
+    """Fold the orders appended since the saved aggregates into them and save; only this half writes"""
+    try:
+        with open(SALES_SUMMARY_FILE, "r") as f:
+            summary = json.load(f)
+    except (FileNotFoundError, ValueError):
+        summary = _empty_sales_summary()
+
+    size = os.path.getsize(ORDERS_FILE) if os.path.exists(ORDERS_FILE) else 0
+    if size < summary["end"]:
+        summary = _empty_sales_summary()  # File shrank, so it was rewritten behind our back
+    if size > summary["end"] or not os.path.exists(SALES_SUMMARY_FILE):
+        # Fold in the unread tail, split across worker processes when it is large
+        _merge_sales(summary, parallel_sales(_file_partitions(ORDERS_FILE, summary["end"])))
+        summary["end"] = size
+        _save_sales_summary(summary)
+    return summary
+
+def _record_status_change(summary, order, new_status):
+    """Update the aggregates when an order moves into or out of Completed"""
+    if order.status == new_status:
+        return
+    if new_status == "Completed":
+        _add_sale(summary, order, 1)
+    elif order.status == "Completed":
+        _add_sale(summary, order, -1)
+
+# ========== PARALLEL REPORTS ==========
+# Sales aggregation split into byte ranges of ORDERS_FILE and whole sealed
+# segments, each scanned as raw bytes by a worker process and merged at the end.
+def scan_orders(path=ORDERS_FILE, begin=0, finish=None, status=None, columns=(0, 1, 2, 3, 4, 5, 6)):
+    """Yield the requested fields of each order as stripped bytes, without decoding lines
+
+    ORDERS_FILE is memory-mapped, so the scan costs no more memory than the
+    pages being read; sealed .gz segments are streamed instead. Rows are
+    filtered on the raw status (bytes, e.g. b"Completed") before anything
+    is materialized. Only orders starting in begin..finish are yielded, so
+    byte ranges can be scanned independently.
+    """
+    for line in _order_lines(path, begin, finish):
+        fields = line.split(b',')
+        if len(fields) not in (7, 8):
+            continue  # Blank or malformed; rows from before menu versions have 7 fields
+        if status is not None and fields[4].strip() != status:
+            continue
+        yield [fields[col].strip() for col in columns]
+
+def _order_lines(path, begin, finish):
+    """Yield the raw lines of an order file that start in begin..finish"""
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield from f
+        return
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            finish = size if finish is None else min(finish, size)
+            position = begin
+            if begin:
+                position = mm.find(b'\n', begin - 1) + 1  # The previous range owns the line straddling begin
+                if not position:
+                    return
+            while position < finish:
+                end = mm.find(b'\n', position)
+                if end == -1:
+                    end = size
+                yield mm[position:end]
+                position = end + 1
+
+def _sales_partition(task):
+    """Worker: sales aggregates of the orders starting in one partition
+
+    task -- (path, begin, finish); finish None reads to the end.
+    Returns the aggregates with "end" holding the number of Completed orders counted.
+    """
+    path, begin, finish = task
+    completed = 0
+    revenue = 0.0
+    by_day, by_item = {}, {}  # Keyed by raw bytes; decoded once at the end
+    for items, total, day in scan_orders(path, begin, finish, b"Completed", columns=(2, 3, 5)):
+        try:
+            total = float(total)
+            quantities = [(item_id, int(quantity)) for item_id, _, quantity in
+                          (item.partition(b':') for item in items.split(b';') if item)]
+        except ValueError:
+            continue  # Malformed row
+        completed += 1
+        revenue += total
+        day_totals = by_day.setdefault(day, [0, 0.0])
+        day_totals[0] += 1
+        day_totals[1] += total
+        for item_id, quantity in quantities:
+            by_item[item_id] = by_item.get(item_id, 0) + quantity
+
+    summary = _empty_sales_summary()
+    summary["end"] = completed
+    summary["completed_orders"] = completed
+    summary["total_sales"] = round(revenue, 2)
+    summary["sales_by_date"] = {day.decode(): [count, round(amount, 2)] for day, (count, amount) in by_day.items()}
+    summary["item_sales"] = {item_id.decode(): quantity for item_id, quantity in by_item.items() if quantity > 0}
+    return summary
+
+def _file_partitions(path, begin=0, parts=REPORT_WORKERS):
+    """Split path from byte begin to its end into parts roughly equal byte ranges"""
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    bounds = [begin + (size - begin) * i // parts for i in range(parts + 1)]
+    return [(path, bounds[i], bounds[i + 1]) for i in range(parts) if bounds[i] < bounds[i + 1]]
+
+def parallel_sales(partitions):
+    """Aggregate completed-order sales over (path, begin, finish) partitions in a process pool
+
+    Small inputs are folded in this process, where a pool would cost more than it saves.
+    """
+    tasks = list(partitions)
+    total_bytes = sum((finish if finish is not None else os.path.getsize(path)) - begin
+                      for path, begin, finish in partitions)
+    summary = _empty_sales_summary()
+    if REPORT_WORKERS > 1 and len(tasks) > 1 and total_bytes >= PARALLEL_REPORT_MIN_BYTES:
+        with ProcessPoolExecutor(max_workers=min(REPORT_WORKERS, len(tasks))) as pool:
+            partials = list(pool.map(_sales_partition, tasks))
+    else:
+        partials = map(_sales_partition, tasks)
+    for partial in partials:
+        _merge_sales(summary, partial)
+        summary["end"] += partial["end"]
+    return summary
+
+# ========== STREAMING ANALYTICS ==========
+# Bounded-memory summaries of every order placed (whatever its status), folded
+# in one pass and saved to SALES_SKETCH_FILE like the sales summary: Count-Min
+# sketches of item and customer frequencies with a top-K heap over each, and
+# per day a small item sketch and a HyperLogLog of distinct customers. Counts
+# can only be overestimated, never missed.
+@functools.lru_cache(maxsize=65536)
+def _sketch_hash(key):
+    """Two independent 64-bit hashes of a string key"""
+    digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+class CountMinSketch:
+    """Approximate counts of any number of keys in depth x width counters"""
+    __slots__ = ("width", "depth", "table")
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, table=None):
+        self.width = width
+        self.depth = depth
+        self.table = table or [0] * (width * depth)
+
+    def _cells(self, key):
+        first, second = _sketch_hash(key)
+        return [row * self.width + (first + row * second) % self.width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        """Count key count more times and return its new estimate"""
+        cells = self._cells(key)
+        estimate = min(self.table[cell] for cell in cells) + count
+        for cell in cells:
+            if self.table[cell] < estimate:
+                self.table[cell] = estimate  # Conservative update: raise only the counters that are too low
+        return estimate
+
+    def estimate(self, key):
+        return min(self.table[cell] for cell in self._cells(key))
+
+class HyperLogLog:
+    """Approximate number of distinct keys in 2**precision one-byte registers"""
+    __slots__ = ("precision", "registers", "estimate")
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = registers or bytearray(1 << precision)
+        self.estimate = None  # count() of the current registers
+
+    def add(self, key):
+        value = _sketch_hash(key)[0]
+        bits = 64 - self.precision
+        register = value >> bits
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1  # Position of the first 1 bit
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+            self.estimate = None
+
+    def count(self):
+        if self.estimate is None:
+            self.estimate = self._count()
+        return self.estimate
+
+    def _count(self):
+        registers = len(self.registers)
+        harmonic = sum(self.registers.count(rank) * 2.0 ** -rank for rank in range(max(self.registers) + 1))
+        estimate = 0.7213 / (1 + 1.079 / registers) * registers ** 2 / harmonic
+        empty = self.registers.count(0)
+        if empty and estimate <= 2.5 * registers:
+            estimate = registers * math.log(registers / empty)  # Linear counting is closer for small sets
+        return round(estimate)
+
+class TopK:
+    """The k keys with the highest estimates offered so far, kept in a min-heap"""
+    __slots__ = ("k", "counts", "heap")
+
+    def __init__(self, k=SKETCH_TOP_K, counts=None):
+        self.k = k
+        self.counts = dict(counts or {})  # Tracked key -> latest estimate
+        self.heap = [(count, key) for key, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def offer(self, key, count):
+        if key not in self.counts and len(self.counts) >= self.k:
+            while self.heap[0][0] != self.counts.get(self.heap[0][1]):
+                heapq.heappop(self.heap)  # Superseded by a later estimate
+            if count <= self.heap[0][0]:
+                return
+            del self.counts[heapq.heappop(self.heap)[1]]
+        self.counts[key] = count
+        heapq.heappush(self.heap, (count, key))
+        if len(self.heap) > 4 * self.k:
+            self.heap = [(count, key) for key, count in self.counts.items()]  # Drop superseded entries
+            heapq.heapify(self.heap)
+
+    def top(self, k):
+        return heapq.nlargest(k, self.counts.items(), key=lambda entry: entry[1])
+
+class SalesSketch:
+    """Streaming analytics over a run of orders"""
+    __slots__ = ("end", "orders", "items", "customers", "top_items", "top_customers", "daily_items",
+                 "daily_customers")
+
+    def __init__(self):
+        self.end = 0  # Bytes of ORDERS_FILE folded in
+        self.orders = 0
+        self.items = CountMinSketch()  # item_id -> quantity ordered
+        self.customers = CountMinSketch()  # username -> orders placed
+        self.top_items = TopK()
+        self.top_customers = TopK()
+        self.daily_items = {}  # date -> CountMinSketch of item_id -> quantity ordered that day
+        self.daily_customers = {}  # date -> HyperLogLog of usernames
+
+    def add_order(self, username, items, day):
+        """Fold in one order; items is [(item_id, quantity)]"""
+        self.orders += 1
+        self.top_customers.offer(username, self.customers.add(username))
+        day_items = self.daily_items.get(day)
+        if day_items is None:
+            day_items = self.daily_items[day] = CountMinSketch(DAILY_SKETCH_WIDTH)
+            self.daily_customers[day] = HyperLogLog()
+        for item_id, quantity in items:
+            self.top_items.offer(item_id, self.items.add(item_id, quantity))
+            day_items.add(item_id, quantity)
+        self.daily_customers[day].add(username)
+
+    def to_json(self):
+        return {
+            "end": self.end,
+            "orders": self.orders,
+            "items": self.items.table,
+            "customers": self.customers.table,
+            "top_items": self.top_items.counts,
+            "top_customers": self.top_customers.counts,
+            "daily_items": {day: items.table for day, items in self.daily_items.items()},
+            "daily_customers": {day: base64.b64encode(customers.registers).decode()
+                                for day, customers in self.daily_customers.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        sketch = cls()
+        sketch.end = data["end"]
+        sketch.orders = data["orders"]
+        for name in ("items", "customers"):
+            if len(data[name]) != SKETCH_WIDTH * SKETCH_DEPTH:
+                raise ValueError("Sketch saved with a different size")
+            getattr(sketch, name).table = data[name]
+        sketch.top_items = TopK(counts=data["top_items"])
+        sketch.top_customers = TopK(counts=data["top_customers"])
+        for day, table in data["daily_items"].items():
+            if len(table) != DAILY_SKETCH_WIDTH * SKETCH_DEPTH:
+                raise ValueError("Sketch saved with a different size")
+            sketch.daily_items[day] = CountMinSketch(DAILY_SKETCH_WIDTH, table=table)
+        sketch.daily_customers = {day: HyperLogLog(registers=bytearray(base64.b64decode(registers)))
+                                  for day, registers in data["daily_customers"].items()}
+        return sketch
+
+def _fold_orders(sketch, rows):
+    """Add (username, items, date) rows to a sketch, skipping malformed ones"""
+    for username, items, day in rows:
+        try:
+            quantities = [(item_id, int(quantity)) for item_id, _, quantity in
+                          (item.partition(':') for item in items.split(';') if item)]
+        except ValueError:
+            continue
+        sketch.add_order(username, quantities, day)
+
+def _scan_sketch_rows(path, begin=0):
+    """The (username, items, date) of each order in an order file, decoded"""
+    for row in scan_orders(path, begin, columns=(1, 2, 5)):
+        yield [field.decode() for field in row]
+
+# The saved sketch is several MB, so between saves new orders are only folded
+# into the copy in memory; other processes catch up from the saved "end".
+_sales_sketch = {"signature": None, "sketch": None, "unsaved": 0}  # Sketch file version, our copy, orders not saved
+
+def _save_sales_sketch(sketch):
+    """Atomically replace the saved sketch"""
+    temp_file = SALES_SKETCH_FILE + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump(sketch.to_json(), f)
+    os.replace(temp_file, SALES_SKETCH_FILE)
+    _sales_sketch.update(signature=_file_signature(SALES_SKETCH_FILE), sketch=sketch, unsaved=0)
+
+def _reset_sales_sketch():
+    """Drop the saved sketch so it is rebuilt from every order on next use"""
+    _sales_sketch.update(signature=None, sketch=None, unsaved=0)
+    if os.path.exists(SALES_SKETCH_FILE):
+        os.remove(SALES_SKETCH_FILE)
+
+@data_lock(exclusive=True)
+def _flush_sales_sketch():
+    """Save orders folded in since the last save, unless another process has saved since"""
+    if _sales_sketch["unsaved"] and _file_signature(SALES_SKETCH_FILE) == _sales_sketch["signature"]:
+        _save_sales_sketch(_sales_sketch["sketch"])
+
+atexit.register(_flush_sales_sketch)
+
+@data_lock()
+def _load_sales_sketch():
+    """Return the saved sketch, folding in any orders appended since it was saved"""
+    sketch = _sales_sketch["sketch"]
+    size = os.path.getsize(ORDERS_FILE) if os.path.exists(ORDERS_FILE) else 0
+    if sketch is not None and sketch.end == size and _file_signature(SALES_SKETCH_FILE) == _sales_sketch["signature"]:
+        return sketch
+    return _catch_up_sales_sketch()
+
+@data_lock(exclusive=True)
+def _catch_up_sales_sketch():
+    """Load the saved sketch if another process replaced it and fold in the orders added since"""
+    signature = _file_signature(SALES_SKETCH_FILE)
+    if _sales_sketch["sketch"] is not None and signature == _sales_sketch["signature"]:
+        sketch = _sales_sketch["sketch"]  # Nobody has saved a newer one
+    else:
+        try:
+            with open(SALES_SKETCH_FILE, "r") as f:
+                sketch = SalesSketch.from_json(json.load(f))
+        except (FileNotFoundError, ValueError, KeyError):
+            sketch = None
+        _sales_sketch.update(signature=signature, sketch=sketch, unsaved=0)
+
+    size = os.path.getsize(ORDERS_FILE) if os.path.exists(ORDERS_FILE) else 0
+    rebuilt = sketch is None or size < sketch.end
+    if rebuilt:
+        sketch = SalesSketch()  # Start over, sealed segments first
+        for month in sorted(order_manifest()["segments"]):
+            _fold_orders(sketch, _scan_sketch_rows(_segment_path(month)))
+    if size > sketch.end or rebuilt:
+        orders = sketch.orders
+        _fold_orders(sketch, _scan_sketch_rows(ORDERS_FILE, sketch.end))
+        sketch.end = size
+        _sales_sketch["sketch"] = sketch
+        _sales_sketch["unsaved"] += sketch.orders - orders
+        if rebuilt or _sales_sketch["unsaved"] >= SKETCH_SAVE_ORDERS:
+            _save_sales_sketch(sketch)
+    return sketch
+
+# ========== KITCHEN QUEUE ==========
+# The Pending and In Progress orders with their offsets in ORDERS_FILE, so the
+# chef screens read only the active orders instead of the whole history.
+def _empty_kitchen_queue():
+    """Queue for an empty order history"""
+    return {
+        "end": 0,  # Bytes of ORDERS_FILE folded into the queue
+        "active": {}  # order_id -> offset of every Pending or In Progress order
+    }
+
+def _save_kitchen_queue(queue):
+    """Atomically replace the saved queue"""
+    temp_file = KITCHEN_QUEUE_FILE + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump(queue, f)
+    os.replace(temp_file, KITCHEN_QUEUE_FILE)
+
+def _reset_kitchen_queue():
+    """Drop the saved queue so it is rebuilt from ORDERS_FILE on next use"""
+    if os.path.exists(KITCHEN_QUEUE_FILE):
+        os.remove(KITCHEN_QUEUE_FILE)
+
+def _record_queue_change(queue, order_id, offset, status):
+    """Add an order to the queue or drop it, depending on its status"""
+    if status in ACTIVE_STATUSES:
+        queue["active"][order_id] = offset
+    else:
+        queue["active"].pop(order_id, None)
+
+@data_lock()
+def _load_kitchen_queue():
+    """Return the saved queue, adding any orders appended since it was saved"""
+    try:
+        with open(KITCHEN_QUEUE_FILE, "r") as f:
+            queue = json.load(f)
+    except (FileNotFoundError, ValueError):
+        queue = None
+    size = os.path.getsize(ORDERS_FILE) if os.path.exists(ORDERS_FILE) else 0
+    if queue is None or size != queue["end"]:
+        return _catch_up_kitchen_queue()
+    return queue
+
+@data_lock(exclusive=True)
+def _catch_up_kitchen_queue():
+    """Add the orders appended since the saved queue to it and save; only this half writes"""
+    try:
+        with open(KITCHEN_QUEUE_FILE, "r") as f:
+            queue = json.load(f)
+    except (FileNotFoundError, ValueError):
+        queue = _empty_kitchen_queue()
+
+    size = os.path.getsize(ORDERS_FILE) if os.path.exists(ORDERS_FILE) else 0
+    if size < queue["end"]:
+        queue = _empty_kitchen_queue()  # File shrank, so it was rewritten behind our back
+    if size > queue["end"] or not os.path.exists(KITCHEN_QUEUE_FILE):
+        with open(ORDERS_FILE, "rb") as f:
+            f.seek(queue["end"])
+            for line in f:
+                fields = line.split(b',')
+                if len(fields) > 4:
+                    _record_queue_change(queue, fields[0].strip().decode(), queue["end"], fields[4].strip().decode())
+                queue["end"] += len(line)
+        _save_kitchen_queue(queue)
+    return queue
+
+@data_lock()
+def kitchen_queue():
+    """Return the active orders in the order they were placed, reading only their records"""
+    if not os.path.exists(ORDERS_FILE):
+        return []
+    for attempt in range(2):
+        queue = _load_kitchen_queue()
+        rows = []
+        with open(ORDERS_FILE, "rb") as f:
+            for order_id, offset in sorted(queue["active"].items(), key=lambda entry: entry[1]):
+                line = _read_order_at(f, order_id, offset)
+                if line is None:
+                    break  # Stale offset
+                rows.append([field.strip() for field in line.decode().split(',')])
+            else:
+                count_io(rows_parsed=len(rows))
+                return _decode_records(ORDERS_FILE, rows)
+        with data_lock(exclusive=True):
+            _reset_kitchen_queue()  # Rebuild once in case the file was edited by hand
+    return _decode_records(ORDERS_FILE, _stream_file(ORDERS_FILE, {4: ACTIVE_STATUSES}))
+
+# ========== ORDER ARCHIVE ==========
+# ORDERS_FILE is the current segment. compact_orders() seals the Completed
+# orders of earlier months into one gzip segment per month under ARCHIVE_DIR.
+# ORDER_MANIFEST_FILE records each sealed segment's date range, status counts,
+# highest order ID and sales totals; ARCHIVE_INDEX_FILE maps every archived
+# order to its customer and month. Sealed orders can no longer change status.
+_archive = {"signature": None, "manifest": None, "orders": {}, "customers": {}}  # Loaded manifest and index
+
+def _empty_manifest():
+    return {"segments": {}}  # "YYYY-MM" -> segment entry
+
+def _segment_path(month):
+    return os.path.join(ARCHIVE_DIR, f"orders-{month}.txt.gz")
+
+@data_lock()
+def order_manifest():
+    """Return the segment manifest, reloading it and the archive index when it changes"""
+    signature = _file_signature(ORDER_MANIFEST_FILE)
+    if _archive["manifest"] is None or signature != _archive["signature"]:
+        try:
+            with open(ORDER_MANIFEST_FILE, "r") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            manifest = _empty_manifest()
+        orders, customers = {}, {}
+        try:
+            with open(ARCHIVE_INDEX_FILE, "r") as f:
+                for line in f:
+                    if line.strip():
+                        order_id, username, month = line.strip().split(',')
+                        orders[order_id] = (username, month)
+                        customers.setdefault(username, []).append(order_id)
+        except FileNotFoundError:
+            pass
+        _archive.update(signature=signature, manifest=manifest, orders=orders, customers=customers)
+    return _archive["manifest"]
+
+def _load_segment(month):
+    """Return the rows of a sealed segment, cached like the tables"""
+    path = _segment_path(month)
+    signature = _file_signature(path)
+    entry = _table_cache.get(path)
+    if entry and entry[0] == signature:
+        _table_cache.move_to_end(path)
+        return entry[1]
+    rows = []
+    try:
+        with gzip.open(path, "rt") as f:
+            rows = [[field.strip() for field in line.split(',')] for line in f if line.strip()]
+    except FileNotFoundError:
+        pass
+    count_io(rows_parsed=len(rows))
+    _cache_table(path, signature, rows)
+    return rows
+
+def _write_segment(month, rows):
+    """Write a sealed segment to a temp file and swap it in atomically"""
+    path = _segment_path(month)
+    temp_file = path + ".tmp"
+    with gzip.open(temp_file, "wt") as f:
+        for row in rows:
+            f.write(','.join(row) + '\n')
+    _fsync_path(temp_file)
+    os.replace(temp_file, path)
+
+def _segment_entry(rows):
+    """Manifest entry describing a segment's rows"""
+    orders = _decode_records(ORDERS_FILE, rows)
+    sales = _empty_sales_summary()
+    status_counts = {}
+    for order in orders:
+        status_counts[order.status] = status_counts.get(order.status, 0) + 1
+        if order.status == "Completed":
+            _add_sale(sales, order, 1)
+    del sales["end"]
+    return {
+        "file": os.path.basename(_segment_path(orders[0].date.strftime("%Y-%m"))),
+        "first_date": min(order.date for order in orders).isoformat(),
+        "last_date": max(order.date for order in orders).isoformat(),
+        "rows": len(rows),
+        "status_counts": status_counts,
+        "last_id": max((int(order.order_id) for order in orders if order.order_id.isdigit()), default=0),
+        "sales": sales,
+    }
+
+def _save_archive(manifest):
+    """Write the archive index, then the manifest that makes it current"""
+    temp_file = ARCHIVE_INDEX_FILE + ".tmp"
+    with open(temp_file, "w") as f:
+        for order_id, (username, month) in _archive["orders"].items():
+            f.write(f"{order_id},{username},{month}\n")
+    _fsync_path(temp_file)
+    os.replace(temp_file, ARCHIVE_INDEX_FILE)
+    temp_file = ORDER_MANIFEST_FILE + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    _fsync_path(temp_file)
+    os.replace(temp_file, ORDER_MANIFEST_FILE)
+    _archive["signature"] = None  # Reload on next use
+
+def _clear_archive():
+    """Delete every sealed segment along with the manifest and index"""
+    for month in order_manifest()["segments"]:
+        if os.path.exists(_segment_path(month)):
+            os.remove(_segment_path(month))
+    for path in [ARCHIVE_INDEX_FILE, ORDER_MANIFEST_FILE]:
+        if os.path.exists(path):
+            os.remove(path)
+    if os.path.isdir(ARCHIVE_DIR) and not os.listdir(ARCHIVE_DIR):
+        os.rmdir(ARCHIVE_DIR)
+    _archive["manifest"] = None
+
+def archived_orders(months=None):
+    """Return the archived orders, oldest month first; only the given months if set"""
+    rows = []
+    for month in sorted(order_manifest()["segments"]):
+        if months is None or month in months:
+            rows.extend(_load_segment(month))
+    return _decode_records(ORDERS_FILE, rows)
+
+def archived_order(order_id):
+    """Return one archived order, or None if it was not archived"""
+    order_manifest()
+    if order_id not in _archive["orders"]:
+        return None
+    return next((order for order in archived_orders({_archive["orders"][order_id][1]}) if order.order_id == order_id),
+                None)
+
+def archived_customer_orders(username):
+    """Return one customer's archived orders, opening only the segments that hold them"""
+    order_manifest()
+    order_ids = set(_archive["customers"].get(username, []))
+    if not order_ids:
+        return []
+    months = {_archive["orders"][order_id][1] for order_id in order_ids}
+    return [order for order in archived_orders(months) if order.order_id in order_ids]
+
+def segments_between(start=None, end=None):
+    """Months of the sealed segments whose date range overlaps start..end"""
+    return {month for month, segment in order_manifest()["segments"].items()
+            if (not end or segment["first_date"] <= end.isoformat())
+            and (not start or segment["last_date"] >= start.isoformat())}
+
+def archived_sales():
+    """Sales totals of every sealed segment, from the manifest alone"""
+    summary = _empty_sales_summary()
+    for segment in order_manifest()["segments"].values():
+        _merge_sales(summary, segment["sales"])
+        summary["end"] += segment["rows"]
+    return summary
+
+def _rename_archived_customer(username, new_username):
+    """Re-seal the segments holding a renamed customer's orders"""
+    manifest = order_manifest()
+    order_ids = set(_archive["customers"].get(username, []))
+    if not order_ids:
+        return
+    for month in {_archive["orders"][order_id][1] for order_id in order_ids}:
+        rows = [list(row) for row in _load_segment(month)]
+        for row in rows:
+            if row[0] in order_ids:
+                row[1] = new_username
+        _write_segment(month, rows)
+    for order_id in order_ids:
+        _archive["orders"][order_id] = (new_username, _archive["orders"][order_id][1])
+    _save_archive(manifest)
+    _reset_sales_sketch()  # Its customer counts still carry the old name
+
+def compact_orders(before=None):
+    """Seal Completed orders placed before `before` (default: this month) into monthly segments
+
+    Returns the number of orders sealed per month.
+    """
+    if not isinstance(STORAGE, TextStorage):
+        raise HotelError("Only the text storage engine keeps order segments")
+    before = before or date.today().replace(day=1)
+    with batch_writes():
+        manifest = order_manifest()
+        sealed, remaining = {}, []
+        for row in read_data(ORDERS_FILE):
+            order = next(iter(_decode_records(ORDERS_FILE, [row])), None)
+            if order and order.status == "Completed" and order.date < before:
+                sealed.setdefault(order.date.strftime("%Y-%m"), []).append(row)
+            else:
+                remaining.append(row)
+        if not sealed:
+            return {}
+
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        for month, rows in sealed.items():
+            # Merge into an earlier segment of the same month; keyed by ID so a rerun after a crash is harmless
+            merged = {row[0]: row for row in _load_segment(month)} if month in manifest["segments"] else {}
+            merged.update((row[0], row) for row in rows)
+            _write_segment(month, list(merged.values()))
+            manifest["segments"][month] = _segment_entry(list(merged.values()))
+            for row in rows:
+                _archive["orders"][row[0]] = (row[1], month)
+        _save_archive(manifest)
+        write_data(ORDERS_FILE, remaining)
+    return {month: len(rows) for month, rows in sorted(sealed.items())}
+
+# ========== RECORDS ==========
+class Order:
+    """One line of ORDERS_FILE with its fields decoded"""
+    __slots__ = ("order_id", "username", "items", "total", "status", "date", "notes", "menu_version")
+
+    def __init__(self, order_id, username, items, total, status, date, notes="", menu_version=None):
+        self.order_id = order_id
+        self.username = username
+        self.items = items  # Tuple of (item_id, quantity)
+        self.total = total
+        self.status = status
+        self.date = date
+        self.notes = notes
+        self.menu_version = menu_version  # Catalog version the order was priced against; None on older rows
+
+    @classmethod
+    def from_row(cls, row):
+        order_id, username, items, total, status, day, notes, *menu_version = row
+        if len(menu_version) > 1:
+            raise ValueError("too many fields")
+        return cls(order_id, username, parse_order_items(items), float(total), status,
+                   date.fromisoformat(day), notes, int(menu_version[0]) if menu_version and menu_version[0] else None)
+
+    def to_row(self):
+        return [self.order_id, self.username, format_order_items(self.items), f"{self.total:.2f}",
+                self.status, self.date.isoformat(), self.notes,
+                str(self.menu_version) if self.menu_version is not None else ""]
+
+class MenuItem:
+    """One line of MENU_FILE"""
+    __slots__ = ("item_id", "name", "price")
+
+    def __init__(self, item_id, name, price):
+        self.item_id = item_id
+        self.name = name
+        self.price = price
+
+    @classmethod
+    def from_row(cls, row):
+        item_id, name, price = row
+        return cls(item_id, name, float(price))
+
+    def to_row(self):
+        return [self.item_id, self.name, str(self.price)]
+
+class User:
+    """One line of USER_FILE"""
+    __slots__ = ("username", "password", "role")
+
+    def __init__(self, username, password, role):
+        self.username = username
+        self.password = password  # Salted hash; plain text on rows written before hashing
+        self.role = role
+
+    @classmethod
+    def from_row(cls, row):
+        username, password, role = row
+        return cls(username, password, role)
+
+    def to_row(self):
+        return [self.username, self.password, self.role]
+
+class Feedback:
+    """One line of FEEDBACK_FILE"""
+    __slots__ = ("feedback_id", "username", "order_id", "rating", "comments", "date")
+
+    def __init__(self, feedback_id, username, order_id, rating, comments, date):
+        self.feedback_id = feedback_id
+        self.username = username
+        self.order_id = order_id
+        self.rating = rating
+        self.comments = comments
+        self.date = date
+
+    @classmethod
+    def from_row(cls, row):
+        feedback_id, username, order_id, rating, comments, day = row
+        return cls(feedback_id, username, order_id, int(rating), comments, date.fromisoformat(day))
+
+    def to_row(self):
+        return [self.feedback_id, self.username, self.order_id, str(self.rating), self.comments,
+                self.date.isoformat()]
+
+class IngredientRequest:
+    """One line of INGREDIENTS_FILE"""
+    __slots__ = ("request_id", "name", "quantity", "status", "requested_by", "date")
+
+    def __init__(self, request_id, name, quantity, status, requested_by, date):
+        self.request_id = request_id
+        self.name = name
+        self.quantity = quantity
+        self.status = status
+        self.requested_by = requested_by
+        self.date = date
+
+    @classmethod
+    def from_row(cls, row):
+        request_id, name, quantity, status, requested_by, day = row
+        return cls(request_id, name, int(quantity), status, requested_by, date.fromisoformat(day))
+
+    def to_row(self):
+        return [self.request_id, self.name, str(self.quantity), self.status, self.requested_by,
+                self.date.isoformat()]
+
+RECORD_TYPES = {
+    ORDERS_FILE: Order,
+    MENU_FILE: MenuItem,
+    USER_FILE: User,
+    FEEDBACK_FILE: Feedback,
+    INGREDIENTS_FILE: IngredientRequest,
+}
+
+def parse_order_items(items):
+    """Turn '01:2;03:1' into (('01', 2), ('03', 1))"""
+    return tuple((item_id, int(quantity)) for item_id, quantity in
+                 (item.split(':') for item in items.split(';') if item))
+
+def format_order_items(items):
+    """Inverse of parse_order_items"""
+    return ';'.join(f"{item_id}:{quantity}" for item_id, quantity in items)
+
+def _decode_records(filename, rows):
+    """Decode rows into typed records, skipping malformed ones"""
+    record_type = RECORD_TYPES[filename]
+    records = []
+    for row in rows:
+        try:
+            records.append(record_type.from_row(row))
+        except (ValueError, TypeError):
+            continue
+    return records
+
+def load_records(filename):
+    """Return the typed records of a table, decoded once per file version
+
+    The records are shared with the cache, so treat them as read-only.
+    """
+    return STORAGE.records(filename)
+
+# ========== STORAGE ENGINES ==========
+TABLE_COLUMNS = {
+    ORDERS_FILE: ("order_id", "username", "items", "total", "status", "date", "notes", "menu_version"),
+    MENU_FILE: ("item_id", "name", "price"),
+    USER_FILE: ("username", "password", "role"),
+    FEEDBACK_FILE: ("feedback_id", "username", "order_id", "rating", "comments", "date"),
+    INGREDIENTS_FILE: ("request_id", "name", "quantity", "status", "requested_by", "date"),
+}
+
+class StorageEngine:
+    """Interface behind read_data/write_data; tables are named by their text file"""
+
+    def read(self, filename):
+        """Return every row of a table as lists of strings the caller may modify"""
+        raise NotImplementedError
+
+    def iter(self, filename, columns=None, where=None):
+        """Yield rows one at a time (see iter_records)"""
+        raise NotImplementedError
+
+    def records(self, filename):
+        """Return the rows of a table decoded into record objects"""
+        raise NotImplementedError
+
+    def write(self, filename, rows):
+        """Replace the whole table"""
+        raise NotImplementedError
+
+    def append(self, filename, row):
+        """Add one row to the end of a table"""
+        raise NotImplementedError
+
+    def append_rows(self, filename, rows):
+        """Add many rows to the end of a table in one write"""
+        raise NotImplementedError
+
+    def has_order(self, order_id):
+        """Whether an order with this ID exists"""
+        raise NotImplementedError
+
+    def find_order(self, order_id):
+        """Return the order with this ID, or None"""
+        raise NotImplementedError
+
+    def set_order_status(self, order_id, new_status):
+        """Change one order's status; returns False if the order does not exist"""
+        raise NotImplementedError
+
+    def set_order_statuses(self, changes):
+        """Apply {order_id: new_status} in one durable write; returns the IDs of the orders found"""
+        raise NotImplementedError
+
+    def active_orders(self):
+        """Return the Pending and In Progress orders, oldest first"""
+        raise NotImplementedError
+
+    def customer_orders(self, username):
+        """Return every order placed by a customer, oldest first"""
+        raise NotImplementedError
+
+    def records_between(self, filename, start=None, end=None):
+        """Return the orders or feedback dated start..end (inclusive; None = unbounded), oldest first"""
+        raise NotImplementedError
+
+    def rename_customer(self, username, new_username):
+        """Move a customer's orders over to their new username"""
+        raise NotImplementedError
+
+    def find_user(self, username):
+        """Return the user with this username (case-insensitive), or None"""
+        raise NotImplementedError
+
+    def table_version(self, filename):
+        """A value that changes whenever the table does, from this process or another"""
+        raise NotImplementedError
+
+    def sales_summary(self, rebuild=False):
+        """Return the completed-order aggregates used by the sales report"""
+        raise NotImplementedError
+
+    def sales_sketch(self, rebuild=False):
+        """Return the streaming analytics over every order placed"""
+        raise NotImplementedError
+
+    def commit(self):
+        """Make the writes of a finished batch_writes() block durable"""
+        raise NotImplementedError
+
+    def rollback(self):
+        """Discard the writes of a failed batch_writes() block"""
+        raise NotImplementedError
+
+def _pad_order_row(filename, row):
+    """Pad the status field of an order row so it can later be patched in place"""
+    if filename != ORDERS_FILE or len(row) < 5:
+        return row
+    return row[:4] + [row[4].ljust(STATUS_WIDTH)] + row[5:]
+
+class TextStorage(StorageEngine):
+    """Comma-separated text files, one per table (the original format)"""
+
+    def read(self, filename):
+        # Hand out copies so callers can edit rows without touching the cache
+        return [list(row) for row in _load_table(filename)]
+
+    def iter(self, filename, columns=None, where=None):
+        entry = _table_cache.get(filename)
+        if filename in _batch["pending"]:
+            rows = _batch["pending"][filename]
+        elif entry and entry[0] == _file_signature(filename):
+            rows = entry[1]  # Already parsed, no need to touch the disk
+        else:
+            rows = _stream_file(filename, where)
+        for row in rows:
+            if where and any(len(row) <= col or row[col] not in allowed for col, allowed in where.items()):
+                continue
+            yield [row[col] for col in columns] if columns else list(row)
+
+    def records(self, filename):
+        rows = _load_table(filename)
+        entry = _table_cache.get(filename)
+        if entry is None or filename in _batch["pending"]:
+            return _decode_records(filename, rows)  # Too big to cache
+        if entry[2] is None:
+            entry[2] = _decode_records(filename, rows)
+        return entry[2]
+
+    def write(self, filename, rows):
+        _batch["pending"][filename] = [list(row) for row in rows]
+        if not _batch["depth"]:
+            self.commit()
+
+    def append(self, filename, row):
+        self.append_rows(filename, [row])
+
+    @data_lock(exclusive=True)
+    def append_rows(self, filename, new_rows):
+        if filename in _batch["pending"]:
+            _batch["pending"][filename].extend(list(row) for row in new_rows)
+            return
+        data = ''.join(','.join(_pad_order_row(filename, row)) + '\n' for row in new_rows).encode()
+        before = _file_signature(filename)
+        fd = os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)  # One O_APPEND write, so the records land whole at the end
+            count_io(bytes_written=len(data))
+            _refresh_cached_table(filename, before, before[1] + len(data) if before else None,
+                                  lambda rows, records: _append_cached_rows(filename, rows, records, new_rows))
+            if FSYNC_BATCH_SIZE:
+                # Group commit: one fsync covers the last FSYNC_BATCH_SIZE appends
+                _unsynced_appends[filename] = _unsynced_appends.get(filename, 0) + len(new_rows)
+                if _unsynced_appends[filename] >= FSYNC_BATCH_SIZE:
+                    os.fsync(fd)
+                    _unsynced_appends[filename] = 0
+        finally:
+            os.close(fd)
+
+    def has_order(self, order_id):
+        return order_id in order_offsets() or archived_order(order_id) is not None
+
+    def find_order(self, order_id):
+        if ORDERS_FILE in _batch["pending"]:
+            live = _decode_records(ORDERS_FILE, self.iter(ORDERS_FILE, where={0: {order_id}}))
+        else:
+            live = order_record(order_id)
+        return live[0] if live else archived_order(order_id)
+
+    def set_order_status(self, order_id, new_status):
+        return order_id in _patch_order_statuses({order_id: new_status})
+
+    def set_order_statuses(self, changes):
+        return _patch_order_statuses(changes)
+
+    def active_orders(self):
+        if ORDERS_FILE in _batch["pending"]:
+            return _decode_records(ORDERS_FILE, self.iter(ORDERS_FILE, where={4: ACTIVE_STATUSES}))
+        return kitchen_queue()
+
+    def customer_orders(self, username):
+        if ORDERS_FILE in _batch["pending"]:
+            live = _decode_records(ORDERS_FILE, self.iter(ORDERS_FILE, where={1: {username}}))
+        else:
+            live = customer_order_history(username)
+        return archived_customer_orders(username) + live
+
+    def records_between(self, filename, start=None, end=None):
+        if filename in _batch["pending"]:
+            rows = [row for row in self.iter(filename) if len(row) > DATE_COLUMN
+                    and (not start or row[DATE_COLUMN] >= start.isoformat())
+                    and (not end or row[DATE_COLUMN] <= end.isoformat())]
+        else:
+            rows = records_in_range(filename, start, end)  # Date index
+        return _decode_records(filename, rows)
+
+    def rename_customer(self, username, new_username):
+        _rename_archived_customer(username, new_username)
+        if ORDERS_FILE not in _batch["pending"] and not customer_index().get(username):
+            return  # Nothing to rewrite
+        orders = self.read(ORDERS_FILE)
+        for order in orders:
+            if len(order) > 1 and order[1] == username:
+                order[1] = new_username
+        self.write(ORDERS_FILE, orders)
+
+    def find_user(self, username):
+        return user_directory().get(_normalize_username(username))
+
+    def sales_summary(self, rebuild=False):
+        if rebuild:
+            _reset_sales_summary()
+        summary = _load_sales_summary()
+        archived = archived_sales()
+        _merge_sales(summary, archived)
+        summary["end"] += archived["end"]
+        return summary
+
+    def sales_sketch(self, rebuild=False):
+        if rebuild:
+            _reset_sales_sketch()
+        return _load_sales_sketch()  # Sealed segments included
+
+    def table_version(self, filename):
+        return _file_signature(filename)
+
+    def commit(self):
+        if _batch["pending"]:
+            _commit_journal(_batch["pending"])
+            _batch["pending"].clear()
+        sync_data()  # Appends made during the batch share the same commit
+
+    def rollback(self):
+        _batch["pending"].clear()
+
+class SqliteStorage(StorageEngine):
+    """All tables in one SQLite database, with indexes for the order lookups"""
+
+    ORDER_INDEXES = ("order_id", "username", "status", "date")
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)  # Server threads take turns via data_lock()
+        self.writes = {}  # filename -> writes made through this connection
+        self.sketch = {"token": None, "sketch": None, "unsaved": 0}  # Saved sketch version, our copy, orders not saved
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            for filename, columns in TABLE_COLUMNS.items():
+                table = self._table(filename)
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                                  f"({', '.join(column + ' TEXT' for column in columns)})")
+                existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+                for column in columns:
+                    if column not in existing:  # Database created before the column was added
+                        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+            for column in self.ORDER_INDEXES:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS orders_{column} ON orders ({column})")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS feedback_date ON feedback (date)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS users_username_nocase ON users (username COLLATE NOCASE)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS sales_sketch (token TEXT, sketch TEXT)")
+        atexit.register(self._flush_sketch)
+
+    @staticmethod
+    def _table(filename):
+        return os.path.splitext(filename)[0]
+
+    def read(self, filename):
+        rows = [list(row) for row in self.conn.execute(f"SELECT * FROM {self._table(filename)} ORDER BY rowid")]
+        count_io(rows_parsed=len(rows))
+        return rows
+
+    def iter(self, filename, columns=None, where=None):
+        names = TABLE_COLUMNS[filename]
+        selected = ', '.join(names[col] for col in columns) if columns else '*'
+        clauses, params = [], []
+        for col, allowed in (where or {}).items():
+            allowed = list(allowed)
+            clauses.append(f"{names[col]} IN ({', '.join('?' * len(allowed))})")
+            params.extend(allowed)
+        sql = f"SELECT {selected} FROM {self._table(filename)}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        for row in self.conn.execute(sql + " ORDER BY rowid", params):
+            yield list(row)
+
+    def records(self, filename):
+        return _decode_records(filename, self.read(filename))
+
+    def _insert_sql(self, filename):
+        return (f"INSERT INTO {self._table(filename)} "
+                f"VALUES ({', '.join('?' * len(TABLE_COLUMNS[filename]))})")
+
+    def _autocommit(self):
+        """Commit now unless a batch_writes() block will commit for us"""
+        if not _batch["depth"]:
+            self.conn.commit()
+
+    def _wrote(self, filename):
+        self.writes[filename] = self.writes.get(filename, 0) + 1
+        self._autocommit()
+
+    def write(self, filename, rows):
+        self.conn.execute(f"DELETE FROM {self._table(filename)}")
+        self.conn.executemany(self._insert_sql(filename), rows)
+        if filename == ORDERS_FILE:
+            self._reset_sketch()  # Row IDs start over
+        self._wrote(filename)
+
+    def append(self, filename, row):
+        self.conn.execute(self._insert_sql(filename), row)
+        self._wrote(filename)
+
+    def append_rows(self, filename, rows):
+        self.conn.executemany(self._insert_sql(filename), rows)
+        self._wrote(filename)
+
+    def has_order(self, order_id):
+        return self.conn.execute("SELECT 1 FROM orders WHERE order_id = ? LIMIT 1", (order_id,)).fetchone() is not None
+
+    def find_order(self, order_id):
+        row = self.conn.execute("SELECT * FROM orders WHERE order_id = ? ORDER BY rowid LIMIT 1",
+                                (order_id,)).fetchone()  # order_id index
+        return _decode_records(ORDERS_FILE, [list(row)])[0] if row else None
+
+    def set_order_status(self, order_id, new_status):
+        cursor = self.conn.execute("UPDATE orders SET status = ? WHERE order_id = ?", (new_status, order_id))
+        self._autocommit()
+        return cursor.rowcount > 0
+
+    def set_order_statuses(self, changes):
+        found = set()
+        for order_id, new_status in changes.items():
+            cursor = self.conn.execute("UPDATE orders SET status = ? WHERE order_id = ?", (new_status, order_id))
+            if cursor.rowcount:
+                found.add(order_id)
+        self._autocommit()  # One transaction for the whole batch
+        return found
+
+    def active_orders(self):
+        return _decode_records(ORDERS_FILE, self.iter(ORDERS_FILE, where={4: ACTIVE_STATUSES}))  # Status index
+
+    def customer_orders(self, username):
+        return _decode_records(ORDERS_FILE, self.iter(ORDERS_FILE, where={1: {username}}))  # Username index
+
+    def records_between(self, filename, start=None, end=None):
+        clauses, params = [], []
+        if start:
+            clauses.append("date >= ?")
+            params.append(start.isoformat())
+        if end:
+            clauses.append("date <= ?")
+            params.append(end.isoformat())
+        sql = f"SELECT * FROM {self._table(filename)}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        rows = [list(row) for row in self.conn.execute(sql + " ORDER BY rowid", params)]  # Date indexes
+        count_io(rows_parsed=len(rows))
+        return _decode_records(filename, rows)
+
+    def rename_customer(self, username, new_username):
+        self.conn.execute("UPDATE orders SET username = ? WHERE username = ?", (new_username, username))
+        self._reset_sketch()  # Its customer counts still carry the old name
+        self._autocommit()
+
+    def find_user(self, username):
+        row = self.conn.execute("SELECT * FROM users WHERE username = ? COLLATE NOCASE ORDER BY rowid LIMIT 1",
+                                (username.strip(),)).fetchone()
+        return User.from_row(list(row)) if row else None
+
+    def sales_summary(self, rebuild=False):
+        # Computed from the status index on every call, so there is nothing to rebuild
+        summary = _empty_sales_summary()
+        summary["end"] = self.conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        completed = self.conn.execute("SELECT * FROM orders WHERE status = 'Completed'")
+        for order in _decode_records(ORDERS_FILE, (list(row) for row in completed)):
+            _add_sale(summary, order, 1)
+        return summary
+
+    # The sketch is saved in its own table with "end" holding the highest
+    # orders rowid folded in. As with the text engine, new orders are only
+    # folded into the copy in memory between saves.
+    def _reset_sketch(self):
+        """Drop the saved sketch, in the current transaction, so it is rebuilt from every order"""
+        self.conn.execute("DELETE FROM sales_sketch")
+        self.sketch.update(token=None, sketch=None, unsaved=0)
+
+    def _save_sketch(self, sketch):
+        token = secrets.token_hex(8)
+        self.conn.execute("DELETE FROM sales_sketch")
+        self.conn.execute("INSERT INTO sales_sketch VALUES (?, ?)", (token, json.dumps(sketch.to_json())))
+        self._autocommit()
+        self.sketch.update(token=token, sketch=sketch, unsaved=0)
+
+    def _sketch_rows(self, sketch):
+        """Yield (username, items, date) of the orders after sketch.end, advancing it as they are read"""
+        for rowid, username, items, day in self.conn.execute(
+                "SELECT rowid, username, items, date FROM orders WHERE rowid > ? ORDER BY rowid", (sketch.end,)):
+            sketch.end = rowid
+            yield username, items, day
+
+    @data_lock()
+    def sales_sketch(self, rebuild=False):
+        if rebuild:
+            self._reset_sketch()
+        row = self.conn.execute("SELECT token FROM sales_sketch").fetchone()
+        token = row[0] if row else None
+        sketch = self.sketch["sketch"]
+        if sketch is None or token != self.sketch["token"]:
+            sketch = None  # Another connection saved or dropped it
+            if token is not None:
+                try:
+                    sketch = SalesSketch.from_json(json.loads(
+                        self.conn.execute("SELECT sketch FROM sales_sketch").fetchone()[0]))
+                except (ValueError, KeyError):
+                    sketch = None
+            self.sketch.update(token=token, sketch=sketch, unsaved=0)
+        rebuilt = sketch is None
+        if rebuilt:
+            sketch = SalesSketch()
+        orders = sketch.orders
+        _fold_orders(sketch, self._sketch_rows(sketch))
+        self.sketch["sketch"] = sketch
+        self.sketch["unsaved"] += sketch.orders - orders
+        if rebuilt or self.sketch["unsaved"] >= SKETCH_SAVE_ORDERS:
+            self._save_sketch(sketch)
+        return sketch
+
+    @data_lock()
+    def _flush_sketch(self):
+        """Save orders folded in since the last save, unless another connection has saved since"""
+        if self.sketch["unsaved"]:
+            row = self.conn.execute("SELECT token FROM sales_sketch").fetchone()
+            if row and row[0] == self.sketch["token"]:
+                self._save_sketch(self.sketch["sketch"])
+
+    def table_version(self, filename):
+        # data_version moves when another connection commits, our own counter when we write
+        return self.conn.execute("PRAGMA data_version").fetchone()[0], self.writes.get(filename, 0)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+        self.sketch.update(token=None, sketch=None, unsaved=0)  # May hold rolled-back orders
+
+def make_storage(name):
+    """Create the storage engine called name ("text" or "sqlite")"""
+    if name == "sqlite":
+        return SqliteStorage(DATABASE_FILE)
+    if name == "text":
+        return TextStorage()
+    raise ValueError(f"Unknown storage engine: {name}")
+
+def migrate_storage(source, target):
+    """Copy every table from one engine to another; returns rows copied per table"""
+    copied = {}
+    for filename, columns in TABLE_COLUMNS.items():
+        rows = source.read(filename)
+        if filename == ORDERS_FILE and isinstance(source, TextStorage):
+            rows = [order.to_row() for order in archived_orders()] + rows
+        if filename == ORDERS_FILE:
+            rows = [row + [""] if len(row) == len(columns) - 1 else row for row in rows]  # Rows without menu_version
+        rows = [["" if field is None else field for field in row]
+                for row in rows if len(row) == len(columns)]  # Drop malformed rows
+        target.write(filename, rows)
+        copied[filename] = len(rows)
+    if isinstance(target, TextStorage):
+        _clear_archive()  # Every order now lives in ORDERS_FILE
+    return copied
+
+STORAGE = make_storage(STORAGE_ENGINE)
+
+def order_exists(order_id):
+    """Whether an order with this ID exists"""
+    return STORAGE.has_order(order_id)
+
+def set_order_status(order_id, new_status):
+    """Change one order's status; returns False if the order does not exist"""
+    return STORAGE.set_order_status(order_id, new_status)
+
+def sales_summary():
+    """Return the sales aggregates used by the sales report"""
+    return STORAGE.sales_summary()
+
+def rebuild_sales_summary():
+    """Recompute the sales aggregates from scratch"""
+    return STORAGE.sales_summary(rebuild=True)
+
+def sales_sketch():
+    """Return the streaming analytics over every order placed"""
+    return STORAGE.sales_sketch()
+
+# ========== USER DIRECTORY ==========
+# Passwords are stored as "pbkdf2_sha256$iterations$salt$hash". Rows still
+# holding a plain-text password are accepted, hashed when that user logs in,
+# and written back REHASH_FLUSH_USERS at a time.
+_user_directory = {"signature": None, "end": 0, "users": {}}  # USER_FILE version, bytes indexed, normalized name -> User
+_verified_passwords = {}  # Stored hash -> digest of the password that matched it this session
+_rehashed = {}  # Username -> (plain-text password on file, its new hash), not yet written back
+
+def _normalize_username(username):
+    return username.strip().lower()
+
+def hash_password(password, salt=None):
+    """Return a salted PBKDF2 hash of password in the stored format"""
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), PASSWORD_HASH_ITERATIONS)
+    return f"pbkdf2_sha256${PASSWORD_HASH_ITERATIONS}${salt}${digest.hex()}"
+
+def is_password_hash(stored):
+    return stored.startswith("pbkdf2_sha256$")
+
+def verify_password(password, stored):
+    """Check password against a stored hash (or legacy plain text), remembering matches for the session"""
+    if not is_password_hash(stored):
+        return hmac.compare_digest(stored.encode(), password.encode())
+    fingerprint = hashlib.sha256(password.encode()).digest()
+    if stored in _verified_passwords:
+        return hmac.compare_digest(_verified_passwords[stored], fingerprint)
+    try:
+        _, iterations, salt, expected = stored.split('$')
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), int(iterations))
+    except ValueError:
+        return False  # Corrupt hash field
+    if not hmac.compare_digest(digest.hex(), expected):
+        return False
+    _verified_passwords[stored] = fingerprint
+    return True
+
+@data_lock()
+def user_directory():
+    """Return normalized username -> User, indexing only the users appended since the last call"""
+    if USER_FILE in _batch["pending"]:
+        users = {}
+        for user in _decode_records(USER_FILE, _batch["pending"][USER_FILE]):
+            users.setdefault(_normalize_username(user.username), user)
+        return users
+    signature = _file_signature(USER_FILE)
+    if signature == _user_directory["signature"]:
+        return _user_directory["users"]
+    previous = _user_directory["signature"]
+    if signature is None or previous is None or signature[0] != previous[0] or signature[1] < _user_directory["end"]:
+        _user_directory.update(end=0, users={})  # Swapped in by a rewrite, so start over
+    rows = []
+    if signature is not None:
+        with open(USER_FILE, "r") as f:
+            f.seek(_user_directory["end"])
+            rows = [[field.strip() for field in line.split(',')] for line in f if line.strip()]
+            _user_directory["end"] = f.tell()
+        count_io(rows_parsed=len(rows))
+    for user in _decode_records(USER_FILE, rows):
+        _user_directory["users"].setdefault(_normalize_username(user.username), user)  # First row wins
+    _user_directory["signature"] = signature
+    return _user_directory["users"]
+
+# ========== MENU CATALOG ==========
+# Every distinct state of the menu gets a version number and a snapshot line in
+# MENU_VERSIONS_FILE. The current catalog is shared by everything in the
+# process and only rebuilt when the menu table or the snapshots change.
+class MenuCatalog:
+    """One version of the menu with its items keyed by ID and prices already parsed"""
+    __slots__ = ("version", "items")
+
+    def __init__(self, version, items):
+        self.version = version
+        self.items = items  # item_id -> MenuItem
+
+    def __contains__(self, item_id):
+        return item_id in self.items
+
+    def __getitem__(self, item_id):
+        return self.items[item_id]
+
+_menu_catalog = {"key": None, "current": None, "history": {}}  # File signatures, current catalog, version -> catalog
+
+def _load_menu_history():
+    """Read every saved menu snapshot into version -> MenuCatalog"""
+    history = {}
+    try:
+        with open(MENU_VERSIONS_FILE, "r") as f:
+            for line in f:
+                try:
+                    snapshot = json.loads(line)
+                    items = _decode_records(MENU_FILE, snapshot["items"])
+                    history[snapshot["version"]] = MenuCatalog(snapshot["version"], {item.item_id: item for item in items})
+                except (ValueError, KeyError, TypeError):
+                    continue  # Torn last line
+    except FileNotFoundError:
+        pass
+    return history
+
+def _save_menu_snapshot(catalog):
+    """Append a snapshot of catalog to MENU_VERSIONS_FILE"""
+    line = json.dumps({"version": catalog.version, "created": datetime.now().isoformat(timespec="seconds"),
+                       "items": [item.to_row() for item in catalog.items.values()]})
+    with open(MENU_VERSIONS_FILE, "a") as f:
+        f.write(line + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+@data_lock()
+def menu_catalog(version=None):
+    """Return the current menu catalog, or the one with the given version (None if unknown)
+
+    A menu that differs from the newest snapshot, whether changed through
+    manage_menu or by hand, is saved as the next version first.
+    """
+    key = (STORAGE.table_version(MENU_FILE), _file_signature(MENU_VERSIONS_FILE))
+    if key != _menu_catalog["key"] or MENU_FILE in _batch["pending"]:
+        _refresh_menu_catalog()
+    if version is None:
+        return _menu_catalog["current"]
+    return _menu_catalog["history"].get(version)
+
+@data_lock(exclusive=True)
+def _refresh_menu_catalog():
+    """Reload the catalog, saving the menu as a new snapshot if it changed; only this half writes"""
+    key = (STORAGE.table_version(MENU_FILE), _file_signature(MENU_VERSIONS_FILE))
+    if key != _menu_catalog["key"] or MENU_FILE in _batch["pending"]:
+        history = _load_menu_history()
+        items = {item.item_id: item for item in load_records(MENU_FILE)}
+        newest = history[max(history)] if history else None
+        if newest is None or [item.to_row() for item in newest.items.values()] != \
+                [item.to_row() for item in items.values()]:
+            newest = MenuCatalog(newest.version + 1 if newest else 1, items)
+            _save_menu_snapshot(newest)
+            history[newest.version] = newest
+        _menu_catalog.update(key=(key[0], _file_signature(MENU_VERSIONS_FILE)), current=newest, history=history)
+
+def item_name(item_id):
+    """Name of a menu item, falling back to the newest older catalog that had it"""
+    catalog = menu_catalog()
+    if item_id in catalog:
+        return catalog[item_id].name
+    for version in sorted(_menu_catalog["history"], reverse=True):
+        if item_id in _menu_catalog["history"][version]:
+            return _menu_catalog["history"][version][item_id].name
+    return "Unknown Item"
+
+# ========== SERVICES ==========
+# Headless business operations: they take plain arguments, return records and
+# raise HotelError instead of prompting or printing. The interactive menus
+# below are thin clients of these.
+STAFF_ROLES = ["Manager", "Chef"]
+
+class HotelError(Exception):
+    """A business rule rejected the request; the message is meant for the user"""
+
+def _today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+def _check_text(label, *values):
+    """Reject free text that would split or end a comma-separated record"""
+    if any(char in value for value in values if value for char in ",\r\n"):
+        raise HotelError(f"{label} cannot contain commas or line breaks!")
+
+def find_user(username):
+    """Return the user with this username (case-insensitive), or None"""
+    return STORAGE.find_user(username)
+
+def authenticate(username, password):
+    """Return (role, stored username) for valid credentials, or None"""
+    user = find_user(username)
+    stored = user.password.strip() if user else ""
+    if not user or not verify_password(password, stored):
+        return None
+    if user.role not in ROLES:  # Prevent invalid roles
+        raise HotelError("Invalid role detected in user file!")
+    if not is_password_hash(stored) and _rehashed.get(user.username, (None,))[0] != stored:
+        _rehashed[user.username] = (stored, hash_password(password))
+        if len(_rehashed) >= REHASH_FLUSH_USERS:
+            flush_rehashed_passwords()
+    return user.role, user.username
+
+def flush_rehashed_passwords():
+    """Write back the hashes of plain-text passwords upgraded at login; returns how many were stored
+
+    A row whose password changed since the login keeps its new value.
+    """
+    pending = {username: _rehashed.pop(username) for username in list(_rehashed)}
+    if not pending:
+        return 0
+    with batch_writes():
+        users = read_data(USER_FILE)
+        upgraded = [user for user in users if len(user) > 1 and pending.get(user[0], (None,))[0] == user[1]]
+        for user in upgraded:
+            user[1] = pending[user[0]][1]
+        if upgraded:
+            write_data(USER_FILE, users)
+    return len(upgraded)
+
+atexit.register(flush_rehashed_passwords)
+
+def register_user(username, password, role="Customer"):
+    """Create a user account and return it"""
+    if not username or not password:
+        raise HotelError("Username and password cannot be empty!")
+    _check_text("Username", username)
+    if role not in ROLES:
+        raise HotelError("Invalid role!")
+    with batch_writes():
+        if find_user(username):
+            raise HotelError("Username already exists!")
+        user = User(username, hash_password(password), role)
+        append_data(USER_FILE, user.to_row())
+    return user
+
+def update_user(username, new_username=None, new_password=None, new_role=None):
+    """Change a user's username, password and/or role; blank values keep the current one"""
+    if new_role and new_role not in STAFF_ROLES:
+        raise HotelError("Invalid role!")
+    _check_text("Username", new_username)
+    with batch_writes():
+        users = read_data(USER_FILE)
+        user = next((user for user in users if user[0] == username), None)
+        if not user:
+            raise HotelError("User not found!")
+        if new_username and new_username != username and find_user(new_username):
+            raise HotelError("Username already taken!")
+        user[0] = new_username or user[0]
+        user[1] = hash_password(new_password) if new_password else user[1]
+        user[2] = new_role or user[2]
+        write_data(USER_FILE, users)
+        if user[0] != username:
+            STORAGE.rename_customer(username, user[0])  # Keep their order history under the new name
+    return User.from_row(user)
+
+def delete_user(username):
+    """Remove a user account"""
+    with batch_writes():
+        users = read_data(USER_FILE)
+        remaining = [user for user in users if user[0] != username]
+        if len(remaining) == len(users):
+            raise HotelError("User not found!")
+        write_data(USER_FILE, remaining)
+
+def add_staff_member(username, password, role):
+    """Admin: create a Manager or Chef account"""
+    if role not in STAFF_ROLES:
+        raise HotelError("Invalid role!")
+    return register_user(username, password, role)
+
+def get_menu():
+    """Return the menu items"""
+    return list(menu_catalog().items.values())
+
+def _check_price(price):
+    try:
+        return float(price)
+    except (TypeError, ValueError):
+        raise HotelError("Invalid price!")
+
+def add_menu_item(item_id, name, price):
+    """Manager: add a dish to the menu"""
+    _check_text("Item ID and name", item_id, name)
+    _check_price(price)
+    with batch_writes():
+        menu = read_data(MENU_FILE)
+        if any(item[0] == item_id for item in menu):
+            raise HotelError("Item ID already exists!")
+        menu.append([item_id, name, str(price)])
+        write_data(MENU_FILE, menu)
+        menu_catalog()  # Snapshot the new version
+    return MenuItem.from_row(menu[-1])
+
+def edit_menu_item(item_id, name=None, price=None):
+    """Manager: rename and/or reprice a dish; None keeps the current value"""
+    _check_text("Item name", name)
+    if price not in (None, ""):
+        price = str(_check_price(price))
+    with batch_writes():
+        menu = read_data(MENU_FILE)
+        item = next((item for item in menu if item[0] == item_id), None)
+        if not item:
+            raise HotelError("Item ID not found!")
+        item[1] = name or item[1]
+        item[2] = price or item[2]
+        write_data(MENU_FILE, menu)
+        menu_catalog()  # Snapshot the new version
+    return MenuItem.from_row(item)
+
+def delete_menu_item(item_id):
+    """Manager: remove a dish from the menu"""
+    with batch_writes():
+        menu = read_data(MENU_FILE)
+        remaining = [item for item in menu if item[0] != item_id]
+        if len(remaining) == len(menu):
+            raise HotelError("Item ID not found!")
+        write_data(MENU_FILE, remaining)
+        menu_catalog()  # Snapshot the new version
+
+def _price_order(menu, username, items, day=None, notes=""):
+    """Validate an order against a MenuCatalog and return it priced, without an ID yet"""
+    if not username:
+        raise HotelError("Missing username")
+    _check_text("Username and notes", username, notes)
+    if not items:
+        raise HotelError("No items selected!")
+    for item_id, quantity in items:
+        if item_id not in menu:
+            raise HotelError(f"Invalid item ID: {item_id}")
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+            raise HotelError(f"Invalid quantity for item {item_id}!")
+
+    total = sum(menu[item_id].price * quantity for item_id, quantity in items)
+    return Order(None, username, tuple(items), total, "Pending", day or date.fromisoformat(_today()), notes,
+                 menu.version)
+
+def create_order(username, items):
+    """Place an order for [(item_id, quantity), ...] and return it"""
+    user = find_user(username) if username else None
+    if user is None:
+        raise HotelError("Customer not found!")
+    order = _price_order(menu_catalog(), user.username, items)
+    order.order_id = allocate_ids(ORDERS_FILE)[0]
+    append_data(ORDERS_FILE, order.to_row())
+    return order
+
+def _read_feed(path):
+    """Yield (line number, raw row, parsed entry or None) from a JSON-lines or CSV order dump"""
+    with open(path, "r", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson", ".json")):
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = None
+                yield line_number, line.rstrip("\r\n"), entry
+        else:
+            reader = csv.DictReader(f)
+            for entry in reader:
+                yield reader.line_num, entry, entry
+
+def _feed_order(menu, entry):
+    """Turn one feed entry into a priced order, raising HotelError if it is unusable"""
+    if not isinstance(entry, dict):
+        raise HotelError("Not a JSON object")
+    username = str(entry.get("username") or "").strip()
+    notes = str(entry.get("notes") or "").strip()
+    try:
+        items = entry.get("items")
+        if isinstance(items, str):
+            items = [(item_id.strip(), quantity.strip()) for item_id, quantity in
+                     (item.split(':') for item in items.split(';') if item)]
+        items = [(str(item_id), int(quantity) if str(quantity).isdigit() else None) for item_id, quantity in items]
+        day = date.fromisoformat(entry["date"]) if entry.get("date") else None
+    except (TypeError, ValueError):
+        raise HotelError("Malformed items or date")
+    return _price_order(menu, username, items, day, notes)
+
+def _append_orders(orders):
+    """Give a block of priced orders consecutive IDs and append them in one write"""
+    if not orders:
+        return 0
+    with batch_writes():
+        for order, order_id in zip(orders, allocate_ids(ORDERS_FILE, len(orders))):
+            order.order_id = order_id
+        append_rows(ORDERS_FILE, [order.to_row() for order in orders])
+    return len(orders)
+
+def ingest_orders(path, rejects_path=None, batch_size=INGEST_BATCH_SIZE):
+    """Stream orders from a delivery-platform dump into ORDERS_FILE; returns (orders added, rows rejected)
+
+    JSON lines (.jsonl/.ndjson/.json): {"username": ..., "items": [[item_id, quantity], ...]
+    or "01:2;03:1", "date": "YYYY-MM-DD", "notes": ...}. Anything else is read as
+    CSV with a header row naming the same columns. date and notes are optional.
+    Rows that fail validation go to rejects_path (default: path + ".rejects") as
+    JSON lines with the line number, the raw row and the reason.
+    """
+    menu = menu_catalog()  # One snapshot prices the whole feed
+    added = rejected = 0
+    block = []
+    with open(rejects_path or path + ".rejects", "w") as rejects:
+        for line_number, raw, entry in _read_feed(path):
+            try:
+                block.append(_feed_order(menu, entry))
+            except HotelError as e:
+                rejects.write(json.dumps({"line": line_number, "row": raw, "error": str(e)}) + '\n')
+                rejected += 1
+            if len(block) >= batch_size:
+                added += _append_orders(block)
+                block = []
+        added += _append_orders(block)
+    return added, rejected
+
+def change_order_status(order_id, new_status):
+    """Chef: move an order to another status"""
+    errors = change_order_statuses([(order_id, new_status)])
+    if errors:
+        raise HotelError(errors[order_id])
+
+def change_order_statuses(changes):
+    """Chef: apply [(order_id, new_status), ...] in one durable write
+
+    Every valid change is applied; returns {order_id: error message} for the rest.
+    An order listed more than once is left alone, since the changes conflict.
+    """
+    errors, valid = {}, {}
+    listed = {}
+    for order_id, _ in changes:
+        listed[order_id] = listed.get(order_id, 0) + 1
+    for order_id, new_status in changes:
+        if listed[order_id] > 1:
+            errors[order_id] = "Order ID listed more than once!"
+        elif new_status not in ORDER_STATUSES:
+            errors[order_id] = "Invalid status!"
+        else:
+            valid[order_id] = new_status
+    found = STORAGE.set_order_statuses(valid) if valid else set()
+    for order_id in set(valid) - found:
+        if archived_order(order_id):
+            errors[order_id] = "Order is archived and can no longer change!"
+        else:
+            errors[order_id] = "Order ID not found!"
+    return errors
+
+def get_order(order_id):
+    """Return one order, or None if it does not exist"""
+    return STORAGE.find_order(order_id)
+
+def active_orders():
+    """Return the orders that are Pending or In Progress, oldest first"""
+    return STORAGE.active_orders()
+
+def customer_orders(username):
+    """Return every order placed by a customer, oldest first"""
+    return STORAGE.customer_orders(username)
+
+def orders_between(start=None, end=None):
+    """Return the orders placed from start to end (dates, inclusive; None = unbounded)
+
+    Only the sealed segments whose date range overlaps are opened, and only
+    the live records in range are read.
+    """
+    months = segments_between(start, end)
+    orders = archived_orders(months) if months else []
+    orders = [order for order in orders if (not start or order.date >= start) and (not end or order.date <= end)]
+    return orders + STORAGE.records_between(ORDERS_FILE, start, end)
+
+def _period_key(day, period):
+    """The day, ISO week or month that a date is reported under"""
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return day.strftime("%Y-%m")
+    return day.isoformat()
+
+def date_range_report(start=None, end=None, period="day"):
+    """Return revenue, items sold and feedback ratings from start to end, grouped by day, week or month
+
+    Returns [(period, figures)] oldest first, with one entry per period that
+    had orders or feedback.
+    """
+    if period not in REPORT_PERIODS:
+        raise HotelError(f"Period must be one of: {', '.join(REPORT_PERIODS)}")
+    if start and end and start > end:
+        raise HotelError("Start date must not be after the end date!")
+    periods = {}
+
+    def figures(day):
+        return periods.setdefault(_period_key(day, period), {
+            "orders": 0, "completed_orders": 0, "revenue": 0.0, "items": {}, "ratings": 0, "average_rating": None})
+
+    for order in orders_between(start, end):
+        entry = figures(order.date)
+        entry["orders"] += 1
+        if order.status == "Completed":
+            entry["completed_orders"] += 1
+            entry["revenue"] += order.total
+            for item_id, quantity in order.items:
+                entry["items"][item_id] = entry["items"].get(item_id, 0) + quantity
+    rating_totals = {}
+    for feedback in STORAGE.records_between(FEEDBACK_FILE, start, end):
+        key = _period_key(feedback.date, period)
+        figures(feedback.date)["ratings"] += 1
+        rating_totals[key] = rating_totals.get(key, 0) + feedback.rating
+    for key, entry in periods.items():
+        entry["revenue"] = round(entry["revenue"], 2)
+        if entry["ratings"]:
+            entry["average_rating"] = round(rating_totals[key] / entry["ratings"], 2)
+    return sorted(periods.items())
+
+def sales_report(start=None, end=None):
+    """Return the sales figures with item names resolved, or None if there are no orders
+
+    With start and/or end, only orders placed in that date range are counted.
+    """
+    if start or end:
+        # Overlapping sealed segments plus the live orders the date index finds in range
+        summary = _empty_sales_summary()
+        for order in orders_between(start, end):
+            summary["end"] += 1
+            if order.status == "Completed":
+                _add_sale(summary, order, 1)
+    else:
+        summary = sales_summary()
+    if not summary["end"]:
+        return None
+    return {
+        "completed_orders": summary["completed_orders"],
+        "total_sales": summary["total_sales"],
+        "top_items": [(item_id, item_name(item_id), quantity) for item_id, quantity in
+                      sorted(summary["item_sales"].items(), key=lambda x: x[1], reverse=True)],
+        "sales_by_date": [(day, revenue) for day, (_, revenue) in sorted(summary["sales_by_date"].items())],
+    }
+
+def _analytics_rows():
+    """The (username, items, date) of every order placed, sealed segments first"""
+    if isinstance(STORAGE, TextStorage):
+        for month in sorted(order_manifest()["segments"]):
+            yield from ([row[1], row[2], row[5]] for row in _load_segment(month))
+    yield from iter_records(ORDERS_FILE, columns=(1, 2, 5))
+
+def order_analytics(k=10, day=None, exact=False):
+    """Return the top k items and customers and the distinct customers per day over every order placed
+
+    By default the answers come from the saved sketches, so they cost the same
+    however long the history is; exact=True recounts everything in one pass
+    to reconcile them. With day, also ranks the items ordered on that date.
+    """
+    if not str(k).isdigit() or int(k) < 1:
+        raise HotelError("k must be a positive whole number")
+    k = int(k)
+    if exact:
+        orders, items, customers, day_items, daily_customers = 0, {}, {}, {}, {}
+        for username, order_items, order_day in _analytics_rows():
+            try:
+                quantities = [(item_id, int(quantity)) for item_id, _, quantity in
+                              (item.partition(':') for item in order_items.split(';') if item)]
+            except ValueError:
+                continue  # Skipped by the sketch too
+            orders += 1
+            customers[username] = customers.get(username, 0) + 1
+            daily_customers.setdefault(order_day, set()).add(username)
+            for item_id, quantity in quantities:
+                items[item_id] = items.get(item_id, 0) + quantity
+                if day and order_day == day.isoformat():
+                    day_items[item_id] = day_items.get(item_id, 0) + quantity
+        top_items = heapq.nlargest(k, items.items(), key=lambda entry: entry[1])
+        top_customers = heapq.nlargest(k, customers.items(), key=lambda entry: entry[1])
+        top_day_items = heapq.nlargest(k, day_items.items(), key=lambda entry: entry[1])
+        distinct = {order_day: len(usernames) for order_day, usernames in daily_customers.items()}
+    else:
+        sketch = sales_sketch()
+        orders = sketch.orders
+        top_items = sketch.top_items.top(k)
+        top_customers = sketch.top_customers.top(k)
+        top_day_items = []
+        day_items = sketch.daily_items.get(day.isoformat()) if day else None
+        if day_items:
+            # Only the menu's items can appear, so ask the day's sketch about each of them
+            candidates = set(menu_catalog().items) | set(sketch.top_items.counts)
+            estimates = ((item_id, day_items.estimate(item_id)) for item_id in candidates)
+            top_day_items = heapq.nlargest(k, (entry for entry in estimates if entry[1]), key=lambda entry: entry[1])
+        distinct = {order_day: customers.count() for order_day, customers in sketch.daily_customers.items()}
+    report = {
+        "exact": exact,
+        "orders": orders,
+        "top_items": [(item_id, item_name(item_id), quantity) for item_id, quantity in top_items],
+        "top_customers": top_customers,
+        "distinct_customers_by_date": sorted(distinct.items()),
+    }
+    if day:
+        report["top_items_on_day"] = [(item_id, item_name(item_id), quantity) for item_id, quantity in top_day_items]
+    return report
+
+def add_feedback(username, rating, comments, order_id=None):
+    """Customer: leave a 1-5 star rating, optionally about one order"""
+    if str(rating) not in ['1', '2', '3', '4', '5']:
+        raise HotelError("Invalid rating! Please use a number between 1 and 5.")
+    if not comments.strip():
+        raise HotelError("Feedback cannot be empty!")
+    _check_text("Feedback", comments)
+    if order_id and not order_exists(order_id):
+        raise HotelError("Order ID not found!")
+    feedback = Feedback(allocate_ids(FEEDBACK_FILE)[0], username, order_id or "N/A", int(rating), comments,
+                        date.fromisoformat(_today()))
+    append_data(FEEDBACK_FILE, feedback.to_row())
+    return feedback
+
+def list_feedback():
+    """Return every feedback entry"""
+    return load_records(FEEDBACK_FILE)
+
+def ingredient_requests(username=None, status=None):
+    """Return ingredient requests, optionally only one chef's and/or one status"""
+    return [req for req in load_records(INGREDIENTS_FILE)
+            if (username is None or req.requested_by == username) and (status is None or req.status == status)]
+
+def request_ingredient(username, name, quantity):
+    """Chef: ask for a quantity of an ingredient"""
+    _check_text("Ingredient name", name)
+    if not str(quantity).isdigit():
+        raise HotelError("Invalid quantity! Must be a whole number.")
+    request = IngredientRequest(allocate_ids(INGREDIENTS_FILE)[0], name, int(quantity), "Requested", username,
+                                date.fromisoformat(_today()))
+    append_data(INGREDIENTS_FILE, request.to_row())
+    return request
+
+def update_ingredient_request(username, request_id, name=None, quantity=None):
+    """Chef: change one of their requests that is still Requested"""
+    _check_text("Ingredient name", name)
+    if quantity not in (None, "") and not str(quantity).isdigit():
+        raise HotelError("Quantity must be a number!")
+    with batch_writes():
+        ingredients = read_data(INGREDIENTS_FILE)
+        request = next((req for req in ingredients
+                        if req[0] == request_id and req[4] == username and req[3] == "Requested"), None)
+        if not request:
+            raise HotelError("Invalid ID or request not editable")
+        request[1] = name or request[1]
+        request[2] = str(quantity) if quantity not in (None, "") else request[2]
+        write_data(INGREDIENTS_FILE, ingredients)
+    return IngredientRequest.from_row(request)
+
+def remove_ingredient_request(username, request_id):
+    """Chef: delete one of their requests"""
+    with batch_writes():
+        ingredients = read_data(INGREDIENTS_FILE)
+        # Check ownership before deletion
+        remaining = [req for req in ingredients if not (req[0] == request_id and req[4] == username)]
+        if len(remaining) == len(ingredients):
+            raise HotelError("Request not found or not authorized")
+        write_data(INGREDIENTS_FILE, remaining)
 
 #======Registeration======
 def register_customer():
     """Allow a customer to register an account"""
-    users = read_data(USER_FILE)  # Read existing users from file
-    
     print("\nCustomer Registration")
     
     # Get new customer details
     username = input("Enter username: ").strip().lower()  # Normalize to lowercase
-    if any(user[0].strip().lower() == username for user in users):
+    if find_user(username):
         print("Username already exists! Please choose another.")
         return
     
@@ -56,15 +2799,16 @@ def register_customer():
         print("Passwords do not match!")
         return
 
-    # Add the new customer to the user list
-    users.append([username, password, "Customer"])
-    
-    # Write updated user data to file
-    write_data(USER_FILE, users)
+    try:
+        register_user(username, password, "Customer")
+    except HotelError as e:
+        print(e)
+        return
     
     print("Registration successful! You can now log in as a Customer.")
 
 #========feedback==============
+@instrumented
 def submit_feedback(username):
     """Allow customer to give feedback with or without an order ID"""
     print("\n📝 Feedback Form")
@@ -73,9 +2817,9 @@ def submit_feedback(username):
     order_id = input("Enter Order ID (or press Enter to skip): ").strip()
     
     # Ensure the order ID exists if provided
-    orders = read_data(ORDERS_FILE)
-    if order_id and not any(order[0] == order_id for order in orders):
+    if order_id and not order_exists(order_id):
         print("⚠️ Order ID not found! Proceeding without an Order ID.")
+        order_id = ""
 
     # Ask for rating
     while True:
@@ -86,23 +2830,19 @@ def submit_feedback(username):
 
     # Ask for feedback comments
     comments = input("Write your feedback: ").strip()
-    
-    if not comments:
-        print("⚠️ Feedback cannot be empty!")
-        return
-
-    # Save feedback
-    feedback_data = read_data(FEEDBACK_FILE)
-    feedback_id = str(len(feedback_data) + 1)
-    feedback_entry = [feedback_id, username, order_id if order_id else "N/A", rating, comments, datetime.now().strftime("%Y-%m-%d")]
 
-    write_data(FEEDBACK_FILE, feedback_data + [feedback_entry])
+    try:
+        add_feedback(username, rating, comments, order_id)
+    except HotelError as e:
+        print(f"⚠️ {e}")
+        return
 
     print("\n✅ Thank you for your feedback!")
 
+@instrumented
 def view_feedback():
     """Admin/Manager: View all customer feedback"""
-    feedbacks = read_data(FEEDBACK_FILE)
+    feedbacks = list_feedback()  # Malformed entries are skipped while decoding
     
     if not feedbacks:
         print("No feedback available.")
@@ -110,78 +2850,46 @@ def view_feedback():
     
     print("\nCustomer Feedback:")
     for feedback in feedbacks:
-        if len(feedback) != 5:  # Ensure correct structure
-            print(f"⚠️ Skipping malformed feedback entry: {feedback}")
-            continue  # Skip incorrect entries
-        
-        order_id, username, rating, comments, timestamp = feedback
-        print(f"Order ID: {order_id}, Customer: {username}, Rating: {rating}, Date: {timestamp}")
-        print(f"Comments: {comments if comments else 'No comments'}\n")
+        print(f"Order ID: {feedback.order_id}, Customer: {feedback.username}, Rating: {feedback.rating}, Date: {feedback.date}")
+        print(f"Comments: {feedback.comments if feedback.comments else 'No comments'}\n")
 
 #=============== Profile Section ==============================
+@instrumented
 def update_profile(username):
     """Allow users to update their profile information"""
-    users = read_data(USER_FILE)
-
-    for user in users:
-        if user[0] == username:
-            print("\nUpdate Profile:")
-            new_username = input(f"Enter new username (current: {username}): ").strip()
-            
-            # Ensure username is unique
-            if new_username and any(u[0] == new_username for u in users):
-                print("⚠️ Username already taken! Choose another.")
-                return
-
-            new_password = input("Enter new password (leave blank to keep current): ").strip()
-            confirm_password = input("Confirm new password: ").strip()
+    if not find_user(username):
+        print("⚠️ User not found!")
+        return
 
-            if new_password and new_password != confirm_password:
-                print("⚠️ Passwords do not match!")
-                return
+    print("\nUpdate Profile:")
+    new_username = input(f"Enter new username (current: {username}): ").strip()
+    
+    # Ensure username is unique
+    if new_username and find_user(new_username):
+        print("⚠️ Username already taken! Choose another.")
+        return
 
-            # Update the user details
-            user[0] = new_username if new_username else user[0]
-            user[1] = new_password if new_password else user[1]
+    new_password = input("Enter new password (leave blank to keep current): ").strip()
+    confirm_password = input("Confirm new password: ").strip()
 
-            write_data(USER_FILE, users)
-            print("✅ Profile updated successfully!")
-            return
+    if new_password and new_password != confirm_password:
+        print("⚠️ Passwords do not match!")
+        return
 
-    print("⚠️ User not found!")
+    try:
+        update_user(username, new_username, new_password)
+    except HotelError as e:
+        print(f"⚠️ {e}")
+        return
+    print("✅ Profile updated successfully!")
 
+@instrumented
 def update_customer_profile(username):
     """Allow customer to update their profile information (username and password only)"""
-    users = read_data(USER_FILE)
-
-    for user in users:
-        if user[0] == username:
-            print("\nUpdate Profile:")
-            new_username = input(f"Enter new username (current: {username}): ").strip()
-            
-            # Ensure username is unique
-            if new_username and any(u[0] == new_username for u in users):
-                print("⚠️ Username already taken! Choose another.")
-                return
-
-            new_password = input("Enter new password (leave blank to keep current): ").strip()
-            confirm_password = input("Confirm new password: ").strip()
-
-            if new_password and new_password != confirm_password:
-                print("⚠️ Passwords do not match!")
-                return
-
-            # Update the user details
-            user[0] = new_username if new_username else user[0]
-            user[1] = new_password if new_password else user[1]
-
-            write_data(USER_FILE, users)
-            print("✅ Profile updated successfully!")
-            return
-
-    print("⚠️ User not found!")
+    update_profile(username)
 
 # ========== INGREDIENT MANAGEMENT ==========
+@instrumented
 def manage_ingredient_requests(username):
     """Chef: Add/Edit/Delete ingredient requests"""
     while True:
@@ -205,32 +2913,19 @@ def manage_ingredient_requests(username):
 
 def add_ingredient_request(username):
     """Chef: Add new ingredient request"""
-    ingredients = read_data(INGREDIENTS_FILE)
-    ingredient_id = str(len(ingredients) + 1)
-    
     name = input("Enter ingredient name: ").strip()
     quantity = input("Enter quantity needed: ").strip()
-    
-    if not quantity.isdigit():
-        print("⚠️ Invalid quantity! Must be a whole number.")
-        return
-
-    new_request = [
-        ingredient_id,
-        name,
-        quantity,
-        "Requested",  # Default status
-        username,
-        datetime.now().strftime("%Y-%m-%d")
-    ]
-    
-    write_data(INGREDIENTS_FILE, ingredients + [new_request])
+
+    try:
+        request_ingredient(username, name, quantity)
+    except HotelError as e:
+        print(f"⚠️ {e}")
+        return
     print(f"✅ Successfully requested {quantity} units of {name}")
 
 def edit_ingredient_request(username):
     """Chef: Edit existing ingredient request"""
-    ingredients = read_data(INGREDIENTS_FILE)
-    chef_requests = [req for req in ingredients if req[4] == username and req[3] == "Requested"]
+    chef_requests = ingredient_requests(username, "Requested")
     
     if not chef_requests:
         print("No editable requests found (only 'Requested' status can be edited).")
@@ -238,36 +2933,28 @@ def edit_ingredient_request(username):
     
     print("\nYour Active Requests:")
     for req in chef_requests:
-        print(f"ID: {req[0]} | {req[1]} - {req[2]} units | Requested on {req[5]}")
+        print(f"ID: {req.request_id} | {req.name} - {req.quantity} units | Requested on {req.date}")
 
     req_id = input("Enter request ID to edit: ").strip()
-    request = next((req for req in chef_requests if req[0] == req_id), None)
+    request = next((req for req in chef_requests if req.request_id == req_id), None)
     
     if not request:
         print("⚠️ Invalid ID or request not editable")
         return
 
-    new_name = input(f"Enter new name ({request[1]}): ").strip() or request[1]
-    new_qty = input(f"Enter new quantity ({request[2]}): ").strip() or request[2]
-    
-    if not new_qty.isdigit():
-        print("⚠️ Quantity must be a number!")
-        return
+    new_name = input(f"Enter new name ({request.name}): ").strip()
+    new_qty = input(f"Enter new quantity ({request.quantity}): ").strip()
 
-    # Update in full ingredients list
-    for i in range(len(ingredients)):
-        if ingredients[i][0] == req_id:
-            ingredients[i][1] = new_name
-            ingredients[i][2] = new_qty
-            break
-    
-    write_data(INGREDIENTS_FILE, ingredients)
+    try:
+        update_ingredient_request(username, req_id, new_name, new_qty)
+    except HotelError as e:
+        print(f"⚠️ {e}")
+        return
     print("✅ Request updated successfully")
 
 def delete_ingredient_request(username):
     """Chef: Delete ingredient request"""
-    ingredients = read_data(INGREDIENTS_FILE)
-    chef_requests = [req for req in ingredients if req[4] == username]
+    chef_requests = ingredient_requests(username)
     
     if not chef_requests:
         print("You have no active requests")
@@ -275,23 +2962,21 @@ def delete_ingredient_request(username):
     
     print("\nYour Requests:")
     for req in chef_requests:
-        print(f"ID: {req[0]} | {req[1]} - {req[2]} units | Status: {req[3]}")
+        print(f"ID: {req.request_id} | {req.name} - {req.quantity} units | Status: {req.status}")
     
     req_id = input("Enter request ID to delete: ").strip()
-    
-    # Check ownership before deletion
-    updated_requests = [req for req in ingredients if not (req[0] == req_id and req[4] == username)]
-    
-    if len(updated_requests) == len(ingredients):
-        print("⚠️ Request not found or not authorized")
+
+    try:
+        remove_ingredient_request(username, req_id)
+    except HotelError as e:
+        print(f"⚠️ {e}")
         return
-    
-    write_data(INGREDIENTS_FILE, updated_requests)
     print("✅ Request deleted successfully")
 
+@instrumented
 def view_ingredient_requests():
     """Manager: View all ingredient requests"""
-    ingredients = read_data(INGREDIENTS_FILE)
+    ingredients = ingredient_requests()
     
     if not ingredients:
         print("No ingredient requests found")
@@ -299,84 +2984,19 @@ def view_ingredient_requests():
     
     print("\n📋 All Ingredient Requests:")
     for req in ingredients:
-        status_color = "🟢" if req[3] == "Approved" else "🟡" if req[3] == "Requested" else "🔴"
-        print(f"{status_color} ID: {req[0]}")
-        print(f"   Ingredient: {req[1]}")
-        print(f"   Quantity: {req[2]}")
-        print(f"   Requested by: {req[4]} on {req[5]}")
-        print(f"   Status: {req[3]}")
+        status_color = "🟢" if req.status == "Approved" else "🟡" if req.status == "Requested" else "🔴"
+        print(f"{status_color} ID: {req.request_id}")
+        print(f"   Ingredient: {req.name}")
+        print(f"   Quantity: {req.quantity}")
+        print(f"   Requested by: {req.requested_by} on {req.date}")
+        print(f"   Status: {req.status}")
         print("-" * 40)
 
-#======== Order =============
-def place_order(username):
-    """Customer: Place a new order"""
-    menu = read_data(MENU_FILE)
-    
-    if not menu:
-        print("The menu is currently empty. Please try again later.")
-        return
-
-    print("\n📋 Menu:")
-    for item in menu:
-        print(f"{item[0]}. {item[1]} - RS{item[2]}")
-
-    order_items = []
-    
-    while True:
-        item_id = input("\nEnter item ID to order (or type 'done' to finish): ").strip()
-        if item_id.lower() == 'done':
-            break
-
-        # Find item by ID
-        item = next((m for m in menu if m[0] == item_id), None)
-        if not item:
-            print("⚠️ Invalid item ID! Please try again.")
-            continue
-
-        quantity = input(f"Enter quantity for {item[1]}: ").strip()
-        if not quantity.isdigit() or int(quantity) <= 0:
-            print("⚠️ Invalid quantity! Please enter a valid number.")
-            continue
-
-        quantity = int(quantity)
-        order_items.append((item_id, quantity, float(item[2])))
-
-    if not order_items:
-        print("⚠️ No items selected! Order not placed.")
-        return
-
-    # Calculate total price
-    total = sum(price * quantity for _, quantity, price in order_items)
-
-    # Generate Order ID
-    orders = read_data(ORDERS_FILE)
-    order_id = str(len(orders) + 1)
-
-    # Format order details
-    order_details = ';'.join([f"{item_id}:{quantity}" for item_id, quantity, _ in order_items])
-    
-    # Save order
-    new_order = [
-        order_id,    # Order ID
-        username,    # Customer Name
-        order_details,  # Ordered Items
-        f"{total:.2f}",  # Total Price
-        "Pending",  # Order Status
-        datetime.now().strftime("%Y-%m-%d"),  # Date
-        ""  # Additional Notes
-    ]
-
-    write_data(ORDERS_FILE, orders + [new_order])
-    
-    print(f"\n✅ Order placed successfully! Order ID: {order_id}")
-    print(f"💰 Total Price: RS{total:.2f}")
-    print("📌 Status: Pending")
 #========View Order  ========
+@instrumented
 def view_order_status(username):
     """Customer: View the status of their orders"""
-    orders = read_data(ORDERS_FILE)
-    
-    user_orders = [order for order in orders if order[1] == username]  # Filter by username
+    user_orders = customer_orders(username)
 
     if not user_orders:
         print("\nYou have no orders yet.")
@@ -384,64 +3004,100 @@ def view_order_status(username):
 
     print("\n📦 Your Orders:")
     for order in user_orders:
-        order_id, _, items, total, status, date, notes = order
-        print(f"🆔 Order ID: {order_id} | 🗓 Date: {date} | 💰 Total: RS{total} | 📌 Status: {status}")
-        print(f"🛒 Items: {items}")
-        if notes:
-            print(f"📝 Notes: {notes}")
+        print(f"🆔 Order ID: {order.order_id} | 🗓 Date: {order.date} | 💰 Total: RS{order.total:.2f} | 📌 Status: {order.status}")
+        print(f"🛒 Items: {format_order_items(order.items)}")
+        if order.notes:
+            print(f"📝 Notes: {order.notes}")
         print("-" * 50)
 
 #================= sales report ============
+@instrumented
 def view_sales_report():
     """Admin: View sales summary"""
-    orders = read_data(ORDERS_FILE)
+    report = sales_report()
     
-    if not orders:
+    if not report:
         print("\nNo sales data available.")
         return
 
-    total_sales = 0.0
-    completed_orders = 0
-    item_sales = {}
-
     print("\n📊 Sales Report")
-    
-    for order in orders:
-        order_id, username, items, total, status, date, notes = order
-        
-        if status == "Completed":
-            total_sales += float(total)
-            completed_orders += 1
-            
-            # Count item sales
-            for item in items.split(';'):
-                item_id, quantity = item.split(':')
-                quantity = int(quantity)
-                if item_id in item_sales:
-                    item_sales[item_id] += quantity
-                else:
-                    item_sales[item_id] = quantity
-
-    print(f"\n✅ Total Completed Orders: {completed_orders}")
-    print(f"💰 Total Sales Revenue: RS{total_sales:.2f}")
+
+    print(f"\n✅ Total Completed Orders: {report['completed_orders']}")
+    print(f"💰 Total Sales Revenue: RS{report['total_sales']:.2f}")
     
     # Show most popular items
     print("\n🍽️ Most Ordered Items:")
-    menu = read_data(MENU_FILE)
-    menu_dict = {item[0]: item[1] for item in menu}  # Map item_id to name
-    
-    for item_id, quantity in sorted(item_sales.items(), key=lambda x: x[1], reverse=True):
-        item_name = menu_dict.get(item_id, "Unknown Item")
+    for _, item_name, quantity in report["top_items"]:
         print(f"📌 {item_name}: {quantity} orders")
 
     print("\n📅 Sales by Date:")
-    unique_dates = sorted(set(order[5] for order in orders if order[4] == "Completed"))
-    for date in unique_dates:
-        date_sales = sum(float(order[3]) for order in orders if order[4] == "Completed" and order[5] == date)
-        print(f"{date}: RS{date_sales:.2f}")
+    for day, date_sales in report["sales_by_date"]:
+        print(f"{day}: RS{date_sales:.2f}")
+
+@instrumented
+def view_date_range_report():
+    """Admin: Revenue, items and ratings for a date range, by day, week or month"""
+    today = date.fromisoformat(_today())
+    try:
+        end = input("End date (YYYY-MM-DD, blank for today): ").strip()
+        end = date.fromisoformat(end) if end else today
+        start = input("Start date (YYYY-MM-DD, blank for the last 7 days): ").strip()
+        start = date.fromisoformat(start) if start else end - timedelta(days=6)
+    except ValueError:
+        print("Invalid date! Use YYYY-MM-DD.")
+        return
+    period = input(f"Group by ({'/'.join(REPORT_PERIODS)}): ").strip().lower() or "day"
+
+    try:
+        report = date_range_report(start, end, period)
+    except HotelError as e:
+        print(e)
+        return
+    if not report:
+        print(f"\nNo orders or feedback from {start} to {end}.")
+        return
+
+    print(f"\n📅 Report from {start} to {end} by {period}")
+    for key, figures in report:
+        rating = f"{figures['average_rating']:.2f}⭐" if figures["ratings"] else "no ratings"
+        print(f"\n{key}: {figures['completed_orders']}/{figures['orders']} orders completed, "
+              f"RS{figures['revenue']:.2f}, {rating} ({figures['ratings']} feedback)")
+        for item_id, quantity in sorted(figures["items"].items(), key=lambda x: x[1], reverse=True):
+            print(f"📌 {item_name(item_id)}: {quantity}")
+
+
+@instrumented
+def view_order_analytics():
+    """Admin: Top items and customers and daily distinct customers, estimated or exact"""
+    exact = input("Exact counts? This reads every order (y/N): ").strip().lower() == 'y'
+    day = input("Also rank the items of one date (YYYY-MM-DD, blank to skip): ").strip()
+    try:
+        report = order_analytics(10, date.fromisoformat(day) if day else None, exact)
+    except ValueError:
+        print("Invalid date! Use YYYY-MM-DD.")
+        return
+    if not report["orders"]:
+        print("\nNo orders placed yet.")
+        return
+
+    print(f"\n📈 Order Analytics ({'exact' if exact else 'estimated'}, {report['orders']} orders)")
+    print("\n🍽️ Top Items:")
+    for _, name, quantity in report["top_items"]:
+        print(f"📌 {name}: {quantity}")
+    print("\n👤 Top Customers:")
+    for customer, orders in report["top_customers"]:
+        print(f"📌 {customer}: {orders} orders")
+    if day:
+        print(f"\n📅 Top Items on {day}:")
+        for _, name, quantity in report["top_items_on_day"]:
+            print(f"📌 {name}: {quantity}")
+    print("\n📅 Distinct Customers by Date (last 7 with orders):")
+    for order_day, customers in report["distinct_customers_by_date"][-7:]:
+        print(f"{order_day}: {customers}")
 
 
 # ========== AUTHENTICATION ==========
+@instrumented
 def login():
     """Handle user login with attempt tracking"""
     attempts = 0
@@ -457,19 +3113,16 @@ def login():
         username = input("Username: ").strip().lower()  # Normalize input
         password = input("Password: ").strip()
 
-        users = read_data(USER_FILE)
-        for user in users:
-            stored_username = user[0].strip().lower()  # Normalize stored data
-            stored_password = user[1].strip()
-            role = user[2].strip()
-
-            if username == stored_username and password == stored_password:
-                if role not in ROLES:  # Prevent invalid roles
-                    print("Error: Invalid role detected in user file!")
-                    return None, None
-                
-                print(f"Login successful! Role: {role}")
-                return role, user[0]  # Return original (case-sensitive) username
+        try:
+            result = authenticate(username, password)
+        except HotelError as e:
+            print(f"Error: {e}")
+            return None, None
+
+        if result:
+            role, stored_username = result
+            print(f"Login successful! Role: {role}")
+            return role, stored_username  # Return original (case-sensitive) username
         
         print(f"Invalid credentials. Attempts left: {MAX_LOGIN_ATTEMPTS - attempts - 1}")
         attempts += 1
@@ -479,10 +3132,9 @@ def login():
 
 
 # ========== ADMIN FUNCTIONS ==========
+@instrumented
 def manage_staff():
     """Admin: Add/Edit/Delete staff accounts"""
-    users = read_data(USER_FILE)
-    
     print("\nStaff Management")
     print("1. Add Staff")
     print("2. Edit Staff")
@@ -491,206 +3143,146 @@ def manage_staff():
     
     if choice == '1':
         # Add Staff
-        add_staff(users)
+        add_staff()
         
     elif choice == '2':
         # Edit Staff
-        edit_staff(users)
+        edit_staff()
         
     elif choice == '3':
         # Delete Staff
-        delete_staff(users)
+        delete_staff()
         
     else:
         print("Invalid choice. Please try again.")
 
-def add_staff(users):
+def add_staff():
     """Add a new staff member"""
     username = input("Enter new username: ")
-    if any(user[0] == username for user in users):
+    if find_user(username):
         print("Username already exists!")
         return
 
     password = input("Enter password: ")
     role = input("Enter role (Manager/Chef): ")
-    if role not in ["Manager", "Chef"]:
-        print("Invalid role!")
-        return
 
-    users.append([username, password, role])
-    write_data(USER_FILE, users)
+    try:
+        add_staff_member(username, password, role)
+    except HotelError as e:
+        print(e)
+        return
     print("Staff added successfully!")
 
-def edit_staff(users):
+def edit_staff():
     """Edit an existing staff member's details"""
     username = input("Enter the username of the staff member to edit: ")
-    
-    # Find the staff member to edit
-    for user in users:
-        if user[0] == username:
-            print(f"Editing {username}'s details...")
-            new_username = input(f"Enter new username (current: {user[0]}): ").strip()
-            new_password = input("Enter new password: ").strip()
-            new_role = input(f"Enter new role (current: {user[2]}): ").strip()
-
-            # Update only if a new value is provided
-            if new_username:
-                user[0] = new_username
-            if new_password:
-                user[1] = new_password
-            if new_role:
-                if new_role in ["Manager", "Chef"]:
-                    user[2] = new_role
-                else:
-                    print("Invalid role!")
-                    return
-            
-            write_data(USER_FILE, users)
-            print(f"Staff details for {username} updated successfully!")
-            return
-    
-    print("Staff member not found!")
+    user = find_user(username)
+    if not user or user.username != username:
+        print("Staff member not found!")
+        return
+
+    print(f"Editing {username}'s details...")
+    new_username = input(f"Enter new username (current: {user.username}): ").strip()
+    new_password = input("Enter new password: ").strip()
+    new_role = input(f"Enter new role (current: {user.role}): ").strip()
 
-def delete_staff(users):
+    # Update only if a new value is provided
+    try:
+        update_user(username, new_username, new_password, new_role)
+    except HotelError as e:
+        print(e)
+        return
+    print(f"Staff details for {username} updated successfully!")
+
+def delete_staff():
     """Delete a staff member"""
     username = input("Enter the username of the staff member to delete: ")
 
-    # Find and delete the staff member
-    for user in users:
-        if user[0] == username:
-            users.remove(user)
-            write_data(USER_FILE, users)
-            print(f"Staff member {username} deleted successfully!")
-            return
-    
-    print("Staff member not found!")
-
-def read_data(filename):
-    """Read data from file"""
     try:
-        with open(filename, 'r') as file:
-            return [line.strip().split(",") for line in file.readlines()]
-    except FileNotFoundError:
-        return []
-
-def write_data(filename, data):
-    """Write data to file"""
-    with open(filename, 'w') as file:
-        for line in data:
-            file.write(",".join(line) + "\n")
+        delete_user(username)
+    except HotelError:
+        print("Staff member not found!")
+        return
+    print(f"Staff member {username} deleted successfully!")
 
 
 # ========== MANAGER FUNCTIONS ==========
+@instrumented
 def manage_menu():
     """Manager: Add/Edit/Delete menu items"""
-    menu = read_data(MENU_FILE)
-
     print("\nMenu Management")
     print("1. Add Item")
     print("2. Edit Item")
     print("3. Delete Item")
     choice = input("Enter choice: ")
 
-    if choice == '1':  #  Add Menu Item
-        item_id = input("Enter item ID: ")
-        if any(item[0] == item_id for item in menu):
-            print("Item ID already exists!")
-            return
-
-        name = input("Enter item name: ")
-        price = input("Enter price: ")
-        try:
-            float(price)
-        except ValueError:
-            print("Invalid price!")
-            return
-
-        menu.append([item_id, name, price])
-        write_data(MENU_FILE, menu)
-        print("Menu item added successfully!")
-
-    elif choice == '2':  # ✅ Edit Menu Item
-        item_id = input("Enter item ID to edit: ")
-        for item in menu:
-            if item[0] == item_id:
-                new_name = input(f"Enter new name (current: {item[1]}): ") or item[1]
-                new_price = input(f"Enter new price (current: {item[2]}): ")
-                
-                try:
-                    new_price = float(new_price) if new_price else item[2]
-                except ValueError:
-                    print("Invalid price!")
-                    return
-
-                item[1], item[2] = new_name, str(new_price)
-                write_data(MENU_FILE, menu)
-                print("Menu item updated successfully!")
+    try:
+        if choice == '1':  #  Add Menu Item
+            item_id = input("Enter item ID: ")
+            if item_id in menu_catalog():
+                print("Item ID already exists!")
                 return
 
-        print("Item ID not found!")
+            name = input("Enter item name: ")
+            price = input("Enter price: ")
+            add_menu_item(item_id, name, price)
+            print("Menu item added successfully!")
 
-    elif choice == '3':  # ✅ Delete Menu Item
-        item_id = input("Enter item ID to delete: ")
-        new_menu = [item for item in menu if item[0] != item_id]
+        elif choice == '2':  # ✅ Edit Menu Item
+            item_id = input("Enter item ID to edit: ")
+            item = menu_catalog().items.get(item_id)
+            if not item:
+                print("Item ID not found!")
+                return
 
-        if len(new_menu) == len(menu):
-            print("Item ID not found!")
-            return
+            new_name = input(f"Enter new name (current: {item.name}): ")
+            new_price = input(f"Enter new price (current: {item.price}): ")
+            edit_menu_item(item_id, new_name, new_price)
+            print("Menu item updated successfully!")
 
-        write_data(MENU_FILE, new_menu)
-        print("Menu item deleted successfully!")
+        elif choice == '3':  # ✅ Delete Menu Item
+            item_id = input("Enter item ID to delete: ")
+            delete_menu_item(item_id)
+            print("Menu item deleted successfully!")
+    except HotelError as e:
+        print(e)
 
 # ========== CHEF FUNCTIONS ==========
+@instrumented
 def view_orders():
     """Chef: View all active orders"""
-    orders = read_data(ORDERS_FILE)
     print("\nActive Orders:")
-    for order in orders:
-        if order[4] in ["Pending", "In Progress"]:
-            print(f"Order {order[0]} - Status: {order[4]} - Items: {order[2]}")
+    for order in active_orders():
+        print(f"Order {order.order_id} - Status: {order.status} - Items: {format_order_items(order.items)}")
 
+@instrumented
 def update_order_status():
-    # Read orders from the file
-    orders = read_data(ORDERS_FILE)
     print("\nActive Orders:")
-    for order in orders:
-        # Display orders with status "Pending" or "In Progress"
-        if order[4] in ["Pending", "In Progress"]:
-            print(f"Order ID: {order[0]} - Status: {order[4]} - Items: {order[2]}")
+    # Display orders with status "Pending" or "In Progress"
+    for order in active_orders():
+        print(f"Order ID: {order.order_id} - Status: {order.status} - Items: {format_order_items(order.items)}")
     
-    # Prompt for an Order ID to update
-    order_id = input("Enter Order ID to update status: ")
+    # Prompt for the Order IDs to update (several can be closed out at once)
+    order_ids = [order_id.strip() for order_id in input("Enter Order ID(s) to update status, comma separated: ").split(',')]
     # Prompt for the new status
     new_status = input("Enter new status (Pending, In Progress, Completed): ")
 
-    # Validate the new status
-    if new_status not in ["Pending", "In Progress", "Completed"]:
-        print("Invalid status!")
-        return
-
-    # Update the status of the selected order
-    order_found = False
-    for order in orders:
-        if order[0] == order_id:
-            order[4] = new_status  # Update the status field
-            order_found = True
-            break
-
-    if order_found:
-        # Write the updated order list back to the file
-        write_data(ORDERS_FILE, orders)
-        print(f"Order {order_id} status updated to {new_status}!")
-    else:
-        print("Order ID not found!")
+    errors = change_order_statuses([(order_id, new_status) for order_id in order_ids if order_id])
+    for order_id in order_ids:
+        if order_id in errors:
+            print(f"Order {order_id}: {errors[order_id]}")
+        elif order_id:
+            print(f"Order {order_id} status updated to {new_status}!")
    
 
 # ========== CUSTOMER FUNCTIONS ==========
+@instrumented
 def place_order(username):
     """Customer: Place new order"""
-    menu = read_data(MENU_FILE)
+    catalog = menu_catalog()
     print("\nMenu:")
-    for item in menu:
-        print(f"{item[0]}. {item[1]} - RS{item[2]}")
+    for item in catalog.items.values():
+        print(f"{item.item_id}. {item.name} - RS{item.price:.2f}")
 
     order_items = []
     while True:
@@ -698,41 +3290,178 @@ def place_order(username):
         if item_id.lower() == 'done':
             break
 
-        # Find item by ID instead of using index
-        item = next((m for m in menu if m[0] == item_id), None)
-        if not item:
+        if item_id not in catalog:
             print("Invalid item ID!")
             continue
 
         quantity = input("Enter quantity: ")
-        if not quantity.isdigit():
+        if not quantity.isdigit() or int(quantity) <= 0:
             print("Invalid quantity!")
             continue
 
-        order_items.append((item_id, int(quantity), float(item[2])))
+        order_items.append((item_id, int(quantity)))
 
-    if not order_items:
-        print("No items selected!")
+    try:
+        order = create_order(username, order_items)
+    except HotelError as e:
+        print(e)
         return
+    print(f"Order placed successfully! Order ID: {order.order_id} Total: RS{order.total:.2f}")
+
+
+# ========== HTTP SERVER ==========
+# `python hotel.py --serve` exposes the order services as JSON endpoints:
+#   POST /orders                 {"username": ..., "items": [[item_id, quantity], ...]}
+#   GET  /orders?username=NAME   that customer's orders
+#   GET  /orders/ID              one order
+#   POST /orders/ID/status       {"status": ...}
+#   POST /orders/status          {"changes": [[order_id, status], ...]}, applied in one write
+#   GET  /kitchen                the Pending and In Progress orders
+#   GET  /sales?from=DATE&to=DATE the sales report, optionally for a date range
+# Connections are served by a bounded pool of worker threads. The workers share
+# this process's table cache; data_lock() lets one of them at a time into it.
+def _order_json(order):
+    return {"order_id": order.order_id, "username": order.username,
+            "items": [[item_id, quantity] for item_id, quantity in order.items],
+            "total": order.total, "status": order.status, "date": order.date.isoformat(), "notes": order.notes,
+            "menu_version": order.menu_version}
+
+def _warm_indexes():
+    """Catch the indexes behind the endpoints up before the first request"""
+    menu_catalog()
+    active_orders()
+    sales_summary()
+    order_exists("")
+    customer_orders("")
+    orders_between(date.today(), date.today())
+
+class OrderRequestHandler(BaseHTTPRequestHandler):
+    """Routes the JSON endpoints to the services"""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive: clients reuse one connection for many requests
+    timeout = SERVER_IDLE_TIMEOUT  # Hand the worker back once a kept-alive connection goes quiet
+    disable_nagle_algorithm = True  # Headers and body go out as two writes; don't hold the second back
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            body = self._read_body() if method == "POST" else {}
+            with data_lock():
+                status, payload = self._route(method, parts, parse_qs(url.query), body)
+        except HotelError as e:
+            status, payload = 400, {"error": str(e)}
+        self._send(status, payload)
+
+    def _route(self, method, parts, query, body):
+        if method == "GET" and parts == ["orders"]:
+            if "username" not in query:
+                raise HotelError("username is required")
+            return 200, [_order_json(order) for order in customer_orders(query["username"][0])]
+        if method == "POST" and parts == ["orders"]:
+            try:
+                items = [(str(item_id), quantity) for item_id, quantity in body.get("items") or []]
+            except (TypeError, ValueError):
+                raise HotelError("items must be a list of [item_id, quantity] pairs")
+            return 201, _order_json(create_order(str(body.get("username", "")), items))
+        if method == "GET" and len(parts) == 2 and parts[0] == "orders":
+            order = get_order(parts[1])
+            return (200, _order_json(order)) if order else (404, {"error": "Order ID not found!"})
+        if method == "POST" and parts == ["orders", "status"]:
+            try:
+                changes = [(str(order_id), str(status)) for order_id, status in body.get("changes") or []]
+            except (TypeError, ValueError):
+                raise HotelError("changes must be a list of [order_id, status] pairs")
+            errors = change_order_statuses(changes)
+            return 200, {"updated": [order_id for order_id, _ in changes if order_id not in errors], "errors": errors}
+        if method == "POST" and len(parts) == 3 and parts[0] == "orders" and parts[2] == "status":
+            change_order_status(parts[1], str(body.get("status", "")))
+            return 200, _order_json(get_order(parts[1]))
+        if method == "GET" and parts == ["kitchen"]:
+            return 200, [_order_json(order) for order in active_orders()]
+        if method == "GET" and parts == ["sales"]:
+            return 200, sales_report(*self._date_range(query)) or {}
+        if method == "GET" and parts == ["analytics"]:
+            try:
+                day = date.fromisoformat(query["day"][0]) if "day" in query else None
+            except ValueError:
+                raise HotelError("day must be a YYYY-MM-DD date")
+            return 200, order_analytics(query.get("k", ["10"])[0], day, query.get("exact", ["0"])[0] == "1")
+        if method == "GET" and parts == ["reports"]:
+            period = query.get("period", ["day"])[0]
+            return 200, [dict(figures, period=key) for key, figures in
+                         date_range_report(*self._date_range(query), period=period)]
+        return 404, {"error": "Not found"}
+
+    @staticmethod
+    def _date_range(query):
+        try:
+            return tuple(date.fromisoformat(query[key][0]) if key in query else None for key in ("from", "to"))
+        except ValueError:
+            raise HotelError("from and to must be YYYY-MM-DD dates")
 
-    # Corrected total price calculation
-    total = sum(price * quantity for _, quantity, price in order_items)
+    def _read_body(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            raise HotelError("Request body must be a JSON object")
+        return body
 
-    orders = read_data(ORDERS_FILE)
-    order_id = str(len(orders) + 1)
-    new_order = [
-        order_id,
-        username,
-        ';'.join([f"{item_id}:{quantity}" for item_id, quantity, _ in order_items]),
-        f"{total:.2f}",
-        "Pending",
-        datetime.now().strftime("%Y-%m-%d"),
-        ""
-    ]
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
 
-    write_data(ORDERS_FILE, orders + [new_order])
-    print(f"Order placed successfully! Total: RS{total:.2f}")
+    def log_message(self, format, *args):
+        pass  # One line per request would drown the console under load
 
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that serves each connection on a fixed-size thread pool"""
+
+    request_queue_size = 1024  # Listen backlog, so a burst of customers queues instead of being refused
+
+    def __init__(self, address, handler, threads):
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="hotel-http")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._serve_connection, request, client_address)
+
+    def _serve_connection(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, threads=SERVER_THREADS):
+    """Run the JSON order server until interrupted"""
+    with data_lock():
+        _warm_indexes()
+    server = PooledHTTPServer((host, port), OrderRequestHandler, threads)
+    print(f"Serving orders on http://{host}:{server.server_port} with {threads} worker threads")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 # ========== MENUS ==========
 def admin_menu(username):
@@ -742,7 +3471,9 @@ def admin_menu(username):
         print("2. View Sales Report")
         print("3. View Feedback")
         print("4. Update Profile")  # ✅ Added
-        print("5. Logout")
+        print("5. Date Range Report")
+        print("6. Order Analytics")
+        print("7. Logout")
         
         choice = input("Enter choice: ")
         if choice == '1':
@@ -754,6 +3485,10 @@ def admin_menu(username):
         elif choice == '4':  # ✅ Added
             update_profile(username)
         elif choice == '5':
+            view_date_range_report()
+        elif choice == '6':
+            view_order_analytics()
+        elif choice == '7':
             break
 
 
@@ -843,6 +3578,34 @@ def main():
             print("Invalid user role!")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Restaurant Management System")
+    parser.add_argument("--migrate", nargs=2, metavar=("FROM", "TO"), choices=["text", "sqlite"],
+                        help="copy every table from one storage engine to the other and exit")
+    parser.add_argument("--ingest", metavar="FILE",
+                        help="import orders from a CSV or JSON-lines dump and exit")
+    parser.add_argument("--rejects", metavar="FILE", help="where --ingest writes rejected rows (default: FILE.rejects)")
+    parser.add_argument("--compact", action="store_true",
+                        help="seal completed orders from before this month into archive segments and exit")
+    parser.add_argument("--serve", action="store_true", help="run the HTTP/JSON order server instead of the menus")
+    parser.add_argument("--host", default=SERVER_HOST, help="address for --serve to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="port for --serve to listen on")
+    parser.add_argument("--threads", type=int, default=SERVER_THREADS, help="worker threads for --serve")
+    args = parser.parse_args()
+
+    if args.migrate:
+        source, target = args.migrate
+        for filename, count in migrate_storage(make_storage(source), make_storage(target)).items():
+            print(f"{filename}: copied {count} rows from {source} to {target}")
+        parser.exit()
+
+    if PROFILE_FILE:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        atexit.register(lambda: (profiler.disable(), profiler.dump_stats(PROFILE_FILE)))
+
+    # Finish any rewrite interrupted by a crash before touching the data
+    recover_journal()
+
     # Initialize all required files
     for file in [USER_FILE, MENU_FILE, ORDERS_FILE, FEEDBACK_FILE, INGREDIENTS_FILE]:
         if not os.path.exists(file):
@@ -850,11 +3613,28 @@ if __name__ == "__main__":
     
     # Create default admin if none exists
     if not read_data(USER_FILE):
-        write_data(USER_FILE, [["admin", "admin123", "Admin"]])
+        write_data(USER_FILE, [["admin", hash_password("admin123"), "Admin"]])
 
     # Initialize feedback file if it doesn't exist
     if not os.path.exists(FEEDBACK_FILE):
         open(FEEDBACK_FILE, 'w').close()
 
+    if args.ingest:
+        added, rejected = ingest_orders(args.ingest, args.rejects)
+        print(f"Imported {added} orders, rejected {rejected} rows")
+        parser.exit()
+
+    if args.compact:
+        try:
+            sealed = compact_orders()
+        except HotelError as e:
+            parser.exit(1, f"{e}\n")
+        for month, count in sealed.items():
+            print(f"{month}: sealed {count} orders")
+        parser.exit()
+
+    if args.serve:
+        serve(args.host, args.port, args.threads)
+        parser.exit()
     
     main()
\ No newline at end of file